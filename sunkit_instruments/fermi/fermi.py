@@ -3,17 +3,20 @@ This module provides processing routines for Fermi Gamma-ray Space Telescope
 (FGST), formerly called the Gamma-ray Large Area Space Telescope (GLAST).
 """
 import copy
+import hashlib
 import os
 import tempfile
 import urllib
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import astropy.units as u
 import matplotlib.pyplot as plt
 import numpy as np
+from astropy.constants import R_earth
 from astropy.coordinates import Latitude, Longitude
 from astropy.io import fits
-from astropy.time import TimeDelta
+from astropy.time import Time, TimeDelta
 from sunpy.coordinates import sun
 from sunpy.time import TimeRange, parse_time
 from sunpy.time.time import _variables_for_parse_time_docstring
@@ -23,10 +26,57 @@ __all__ = [
     "download_weekly_pointing_file",
     "get_detector_sun_angles_for_time",
     "get_detector_sun_angles_for_date",
+    "get_detector_sun_angles_for_dates",
+    "get_sun_occultation_and_saa_flags",
     "plot_detector_sun_angles",
     "met_to_utc",
 ]
 
+# Fermi/GBM NaI detector [azimuth, zenith] angles in degrees, in spacecraft
+# coordinates (Meegan et al. 2009).
+NAI_DETECTOR_NAMES = tuple(f"n{i}" for i in range(12))
+_nai_detector_azimuth_zenith = np.array(
+    [
+        [45.89, 20.58],
+        [45.11, 45.31],
+        [58.44, 90.21],
+        [314.87, 45.24],
+        [303.15, 90.27],
+        [3.35, 89.79],
+        [224.93, 20.43],
+        [224.62, 46.18],
+        [236.61, 89.97],
+        [135.19, 45.55],
+        [123.73, 90.42],
+        [183.74, 90.32],
+    ]
+)
+_nai_detector_azimuth_zenith.flags.writeable = False
+
+
+def _detector_unit_vectors(azimuth, zenith):
+    """
+    Unit vectors in spacecraft coordinates for the given azimuth (from "+x")
+    and zenith (from "+z") angles in degrees.
+    """
+    azimuth = np.deg2rad(azimuth)
+    zenith = np.deg2rad(zenith)
+    return np.stack(
+        [
+            np.sin(zenith) * np.cos(azimuth),
+            np.sin(zenith) * np.sin(azimuth),
+            np.cos(zenith),
+        ],
+        axis=-1,
+    )
+
+
+# (12, 3) array of the NaI detector pointing unit vectors in spacecraft coordinates.
+NAI_DETECTOR_UNIT_VECTORS = _detector_unit_vectors(
+    _nai_detector_azimuth_zenith[:, 0], _nai_detector_azimuth_zenith[:, 1]
+)
+NAI_DETECTOR_UNIT_VECTORS.flags.writeable = False
+
 
 @add_common_docstring(**_variables_for_parse_time_docstring())
 def download_weekly_pointing_file(date):
@@ -160,89 +210,340 @@ def get_detector_sun_angles_for_date(date, file):
 
     date = parse_time(date)
     tran = TimeRange(date, date + TimeDelta(1 * u.day))
-    scx, scz, times = get_scx_scz_in_timerange(tran, file)
+    with fits.open(file) as hdulist:
+        table = hdulist[1].data
+        times = met_to_utc(np.array(table["START"], dtype=float))
+        startind = np.searchsorted(times, tran.start)
+        endind = np.searchsorted(times, tran.end)
+        pointing = {
+            name: np.deg2rad(np.array(table[name][startind:endind], dtype=float))
+            for name in ["RA_SCX", "DEC_SCX", "RA_SCZ", "DEC_SCZ"]
+        }
+    times = times[startind:endind]
+
+    # get the detector pointings for every time at once as (N, 12, 3) unit vectors
+    attitude = _spacecraft_attitude_matrices(
+        pointing["RA_SCX"], pointing["DEC_SCX"], pointing["RA_SCZ"], pointing["DEC_SCZ"]
+    )
+    detector_vectors = np.einsum("nij,dj->ndi", attitude, NAI_DETECTOR_UNIT_VECTORS)
 
-    # retrieve the detector angle information in spacecraft coordinates
-    detectors = nai_detector_angles()
+    sun_vector = _radec_to_unit_vector(
+        sun.apparent_rightascension(times).to_value(u.rad),
+        sun.apparent_declination(times).to_value(u.rad),
+    )
+    cosine_of_angle = np.einsum("ndi,ni->dn", detector_vectors, sun_vector)
+    detector_to_sun_angles = np.rad2deg(np.arccos(np.clip(cosine_of_angle, -1, 1)))
 
-    detector_to_sun_angles = []
-    # get the detector vs Sun angles for each t and store in a list of
-    # dictionaries.
-    for i in range(len(scx)):
-        detector_radecs = nai_detector_radecs(detectors, scx[i], scz[i], times[i])
-
-        # this gets the sun position with RA in hours in decimal format
-        # (e.g. 4.3). DEC is already in degrees
-        sunpos_ra_not_in_deg = [
-            sun.apparent_rightascension(times[i]),
-            sun.apparent_declination(times[i]),
-        ]
-        # now Sun position with RA in degrees
-        sun_pos = [sunpos_ra_not_in_deg[0].to("deg"), sunpos_ra_not_in_deg[1]]
-        # now get the angle between each detector and the Sun
-        detector_to_sun_angles.append(
-            get_detector_separation_angles(detector_radecs, sun_pos)
+    angles = OrderedDict()
+    for name, detector_angles in zip(NAI_DETECTOR_NAMES, detector_to_sun_angles):
+        angles[name] = detector_angles * u.deg
+    angles["time"] = list(times)
+
+    return angles
+
+
+def get_detector_sun_angles_for_dates(
+    dates, files, cadence=1 * u.min, cache_dir=None, max_workers=None
+):
+    """
+    Get the GBM detector angles vs the Sun as a function of time for many
+    dates, computing the dates in parallel.
+
+    Each date is computed with
+    `~sunkit_instruments.fermi.get_detector_sun_angles_for_date` in a separate
+    process. If ``cache_dir`` is given, the result for every date is stored
+    there, keyed by the checksum of the pointing file and the cadence, so that
+    rerunning or extending a survey only computes the missing dates.
+
+    Parameters
+    ----------
+    dates : `list`
+        A list of dates, each parse_time-compatible.
+    files : `str` or `list` of `str`
+        A filepath to a Fermi/LAT weekly pointing file covering all the dates,
+        or a list with one filepath for each date.
+    cadence : `~astropy.units.Quantity`, optional
+        The minimum time between the returned samples. Defaults to one minute,
+        the cadence of the weekly pointing files.
+    cache_dir : `str`, optional
+        A directory in which to cache the results. Defaults to no caching.
+    max_workers : `int`, optional
+        The number of processes to use. Defaults to the number of processors
+        on the machine.
+
+    Returns
+    -------
+    `collections.OrderedDict`
+        A dictionary mapping each date, as a ``"YYYY-MM-DD"`` string, to the
+        detector angles for that date in the same form as returned by
+        `~sunkit_instruments.fermi.get_detector_sun_angles_for_date`.
+        The angles are stored as single precision floats.
+    """
+    dates = [parse_time(date) for date in dates]
+    if isinstance(files, (str, os.PathLike)):
+        files = [files] * len(dates)
+    if len(files) != len(dates):
+        raise ValueError(
+            f"Expected one pointing file per date, got {len(files)} files for "
+            f"{len(dates)} dates."
         )
+    cadence = cadence.to_value(u.s)
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        checksums = {file: _file_checksum(file) for file in set(files)}
+
+    results = OrderedDict()
+    to_compute = []
+    for date, file in zip(dates, files):
+        key = date.strftime("%Y-%m-%d")
+        cache_file = None
+        if cache_dir is not None:
+            cache_file = os.path.join(
+                cache_dir,
+                f"fermi_sun_angles_{checksums[file][:16]}_{cadence:g}s_"
+                f"{date.strftime('%Y%m%d')}.npz",
+            )
+            if os.path.exists(cache_file):
+                with np.load(cache_file) as cached:
+                    results[key] = (cached["met"], cached["angles"])
+                continue
+        results[key] = None
+        to_compute.append((key, date, file, cache_file))
+
+    if to_compute:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    _detector_sun_angles_for_date_arrays, date, file, cadence
+                )
+                for _, date, file, _ in to_compute
+            ]
+            for (key, _, _, cache_file), future in zip(to_compute, futures):
+                met, angles = future.result()
+                if cache_file is not None:
+                    # Write to a temporary file first so that an interrupted
+                    # run never leaves a truncated cache entry behind.
+                    tmp_file = cache_file + ".tmp"
+                    with open(tmp_file, "wb") as fd:
+                        np.savez(fd, met=met, angles=angles)
+                    os.replace(tmp_file, cache_file)
+                results[key] = (met, angles)
+
+    for key, (met, angles) in results.items():
+        results[key] = _detector_sun_angles_from_arrays(met, angles)
+
+    return results
+
+
+def get_sun_occultation_and_saa_flags(
+    file, timerange=None, atmosphere_height=100 * u.km
+):
+    """
+    Flags the times at which the Sun is occulted by the Earth and the times
+    at which Fermi is inside the South Atlantic Anomaly (SAA).
 
-    # slice the list of dictionaries to get the angles for each detector in a
-    # list form
-    angles = OrderedDict()
-    key_list = [
-        "n0",
-        "n1",
-        "n2",
-        "n3",
-        "n4",
-        "n5",
-        "n6",
-        "n7",
-        "n8",
-        "n9",
-        "n10",
-        "n11",
-        "time",
-    ]
-    for i in range(13):
-        if not key_list[i] == "time":
-            angles[key_list[i]] = [
-                item[key_list[i]].value for item in detector_to_sun_angles
-            ] * u.deg
-        else:
-            angles[key_list[i]] = [item[key_list[i]] for item in detector_to_sun_angles]
+    Both flags are computed for every pointing row of the weekly file at
+    once, from the spacecraft position (``SC_POSITION``) and the SAA
+    (``IN_SAA``) columns.
+
+    Parameters
+    ----------
+    file : `str`
+        A filepath to a Fermi/LAT weekly pointing file (e.g. as obtained by the
+        `~sunkit_instruments.fermi.download_weekly_pointing_file` function).
+    timerange : `sunpy.time.TimeRange`, optional
+        If given, only the rows within this time range are returned. These are
+        the same rows as used by
+        `~sunkit_instruments.fermi.get_detector_sun_angles_for_date`, so the
+        returned flags can be used directly to mask its angles.
+    atmosphere_height : `~astropy.units.Quantity`, optional
+        The height above the Earth's surface below which the atmosphere is
+        considered opaque to the solar X-rays. Defaults to 100 km.
+
+    Returns
+    -------
+    `collections.OrderedDict`
+        A dictionary containing boolean arrays for ``"sun_occulted"`` and
+        ``"in_saa"`` along with a `~astropy.time.Time` array ``"time"``.
+    """
+    with fits.open(file) as hdulist:
+        table = hdulist[1].data
+        met = np.array(table["START"], dtype=float)
+        position = np.array(table["SC_POSITION"], dtype=float)
+        in_saa = np.array(table["IN_SAA"], dtype=bool)
+
+    times = met_to_utc(met)
+    if timerange is not None:
+        startind = np.searchsorted(times, timerange.start)
+        endind = np.searchsorted(times, timerange.end)
+        times = times[startind:endind]
+        position = position[startind:endind]
+        in_saa = in_saa[startind:endind]
+
+    # The Sun is effectively at infinity, so its direction from the spacecraft
+    # is the same as its direction from the centre of the Earth.
+    sun_vector = _radec_to_unit_vector(
+        sun.apparent_rightascension(times).to_value(u.rad),
+        sun.apparent_declination(times).to_value(u.rad),
+    )
 
+    # SC_POSITION is the spacecraft position in metres from the Earth centre.
+    distance = np.linalg.norm(position, axis=-1)
+    earth_vector = -position / distance[:, np.newaxis]
+    limb_radius = (R_earth + atmosphere_height).to_value(u.m)
+    earth_angular_radius = np.arcsin(np.clip(limb_radius / distance, -1, 1))
+    sun_earth_angle = np.arccos(
+        np.clip(np.einsum("ij,ij->i", sun_vector, earth_vector), -1, 1)
+    )
+
+    flags = OrderedDict()
+    flags["sun_occulted"] = sun_earth_angle < earth_angular_radius
+    flags["in_saa"] = in_saa
+    flags["time"] = times
+
+    return flags
+
+
+def _file_checksum(file):
+    """
+    Returns the SHA-256 checksum of a file.
+    """
+    sha256 = hashlib.sha256()
+    with open(file, "rb") as fd:
+        for block in iter(lambda: fd.read(2**20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _detector_sun_angles_for_date_arrays(date, file, cadence):
+    """
+    Compute the detector angles for a date as compact arrays.
+
+    Returns the Fermi MET of each sample and a (12, N) single precision array
+    of the detector angles in degrees, keeping one sample per ``cadence``
+    seconds.
+    """
+    angles = get_detector_sun_angles_for_date(date, file)
+    if len(angles["time"]) == 0:
+        return np.zeros(0), np.zeros((12, 0), dtype=np.float32)
+
+    met = utc_to_met(Time(angles["time"])).to_value(u.s)
+    bins = np.floor((met - met[0]) / cadence)
+    keep = np.concatenate([[True], np.diff(bins) > 0])
+    detector_angles = np.array(
+        [angles[f"n{i}"].to_value(u.deg) for i in range(12)], dtype=np.float32
+    )
+    return met[keep], detector_angles[:, keep]
+
+
+def _detector_sun_angles_from_arrays(met, detector_angles):
+    """
+    Convert the output of ``_detector_sun_angles_for_date_arrays`` back to the
+    dictionary returned by ``get_detector_sun_angles_for_date``.
+    """
+    angles = OrderedDict()
+    for i in range(12):
+        angles[f"n{i}"] = detector_angles[i].astype(float) * u.deg
+    angles["time"] = list(met_to_utc(met)) if len(met) else []
     return angles
 
 
-def plot_detector_sun_angles(angles):
+def plot_detector_sun_angles(angles, axes=None, max_points=None, animated=False):
     """
     Plots the Fermi/GBM detector angles as a function of time.
 
+    Long angle histories are reduced to their minimum/maximum envelope so that
+    at most ``max_points`` points are drawn per detector, which keeps the
+    plot looking the same while rendering much faster.
+
     Parameters
     ----------
     angles : `dict`
         A dictionary containing the Fermi/GBM detector angle information as a
         function of time. Obtained from the
-        `~sunkit_instruments.fermi.get_detector_separation_angles` function.
+        `~sunkit_instruments.fermi.get_detector_sun_angles_for_date` function.
+        The ``"time"`` can be a list of times or a `~astropy.time.Time` array.
+    axes : `matplotlib.axes.Axes`, optional
+        The axes to plot into. If not given, a new figure is created and shown.
+    max_points : `int`, optional
+        The maximum number of points to draw for each detector. Defaults to two
+        per pixel column of ``axes``.
+    animated : `bool`, optional
+        Whether to mark the lines as animated, so that they can be redrawn
+        with blitting. Defaults to `False`.
+
+    Returns
+    -------
+    `list` of `matplotlib.lines.Line2D`
+        The line for each detector.
     """
+    show = axes is None
+    if axes is None:
+        figure = plt.figure(1)
+        axes = figure.gca()
+    if max_points is None:
+        max_points = 2 * max(int(axes.bbox.width), 1)
+
+    # Only the times that are drawn are converted, which for long histories
+    # given as a list of scalar times is much quicker than converting them all.
+    times = angles["time"]
+    starts = _minmax_decimation_starts(len(times), max_points // 2)
+    if starts is None:
+        plot_index = np.arange(len(times))
+    else:
+        ends = np.append(starts[1:], len(times)) - 1
+        plot_index = np.column_stack([starts, ends]).ravel()
+    if isinstance(times, Time):
+        plot_times = times[plot_index]
+    else:
+        plot_times = Time([times[i] for i in plot_index])
+    x = plot_times.plot_date
 
     # make a plot showing the angles vs time
-    figure = plt.figure(1)
+    lines = []
     for n in angles.keys():
         if not n == "time":
-            plt.plot(
-                angles["time"],
-                angles[n].value,
-                label="{lab} ({val})".format(
-                    lab=n, val=str(np.mean(angles[n].value))[0:5]
-                ),
+            y = angles[n].to_value(u.deg)
+            plot_y = y
+            if starts is not None:
+                # fmin/fmax ignore NaNs (e.g. masked occultation times) within a bin
+                plot_y = np.column_stack(
+                    [np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts)]
+                ).ravel()
+            (line,) = axes.plot(
+                x,
+                plot_y,
+                label="{lab} ({val})".format(lab=n, val=str(np.mean(y))[0:5]),
+                animated=animated,
             )
-    plt.ylim(180, 0)
-    plt.ylabel("angle (degrees)")
-    plt.xlabel("Start time: " + angles["time"][0].isoformat())
-    plt.title("Detector pointing angle from Sun")
-    plt.legend(fontsize=10)
-    figure.autofmt_xdate()
-    plt.show()
+            lines.append(line)
+    axes.xaxis_date()
+    axes.set_ylim(180, 0)
+    axes.set_ylabel("angle (degrees)")
+    axes.set_xlabel("Start time: " + plot_times[0].isot)
+    axes.set_title("Detector pointing angle from Sun")
+    axes.legend(fontsize=10)
+    axes.figure.autofmt_xdate()
+    if show:
+        plt.show()
+
+    return lines
+
+
+def _minmax_decimation_starts(n_samples, n_bins):
+    """
+    The first sample of each of ``n_bins`` consecutive bins of samples, which
+    a line is reduced to the minimum and maximum of, so that it draws the same
+    envelope.
+
+    `None` is returned for lines with no more than two samples per bin, which
+    are drawn unchanged.
+    """
+    n_bins = max(n_bins, 1)
+    if n_samples <= 2 * n_bins:
+        return None
+    return np.linspace(0, n_samples, n_bins + 1).astype(int)[:-1]
 
 
 @add_common_docstring(**_variables_for_parse_time_docstring())
@@ -348,18 +649,10 @@ def nai_detector_angles():
 
     # angles listed as [azimuth, zenith]
     detectors = {
-        "n0": [45.89 * u.deg, 20.58 * u.deg],
-        "n1": [45.11 * u.deg, 45.31 * u.deg],
-        "n2": [58.44 * u.deg, 90.21 * u.deg],
-        "n3": [314.87 * u.deg, 45.24 * u.deg],
-        "n4": [303.15 * u.deg, 90.27 * u.deg],
-        "n5": [3.35 * u.deg, 89.79 * u.deg],
-        "n6": [224.93 * u.deg, 20.43 * u.deg],
-        "n7": [224.62 * u.deg, 46.18 * u.deg],
-        "n8": [236.61 * u.deg, 89.97 * u.deg],
-        "n9": [135.19 * u.deg, 45.55 * u.deg],
-        "n10": [123.73 * u.deg, 90.42 * u.deg],
-        "n11": [183.74 * u.deg, 90.32 * u.deg],
+        name: [azimuth * u.deg, zenith * u.deg]
+        for name, (azimuth, zenith) in zip(
+            NAI_DETECTOR_NAMES, _nai_detector_azimuth_zenith
+        )
     }
 
     return detectors
@@ -398,47 +691,53 @@ def nai_detector_radecs(detectors, scx, scz, time):
         the given input time.
     """
 
-    scx_vector = np.array(
-        [
-            np.cos(scx[0].to("rad").value) * np.cos(scx[1].to("rad").value),
-            np.sin(scx[0].to("rad").value) * np.cos(scx[1].to("rad").value),
-            np.sin(scx[1].to("rad").value),
-        ]
+    attitude = _spacecraft_attitude_matrices(
+        scx[0].to_value(u.rad),
+        scx[1].to_value(u.rad),
+        scz[0].to_value(u.rad),
+        scz[1].to_value(u.rad),
     )
 
-    scz_vector = np.array(
-        [
-            np.cos(scz[0].to("rad").value) * np.cos(scz[1].to("rad").value),
-            np.sin(scz[0].to("rad").value) * np.cos(scz[1].to("rad").value),
-            np.sin(scz[1].to("rad").value),
-        ]
-    )
+    names = list(detectors.keys())
+    if names == list(NAI_DETECTOR_NAMES):
+        spacecraft_vectors = NAI_DETECTOR_UNIT_VECTORS
+    else:
+        spacecraft_vectors = _detector_unit_vectors(
+            [detectors[name][0].to_value(u.deg) for name in names],
+            [detectors[name][1].to_value(u.deg) for name in names],
+        )
 
-    # For each detector, do the rotation depending on the detector zenith and
-    # azimuth angles.
-    detector_radecs = copy.deepcopy(detectors)
-    for l, d in detectors.items():
-        phi = d[0].value
-        theta = d[1].value
+    # rotate all the detectors into "RA/DEC" with a single matrix product
+    vectors = spacecraft_vectors @ attitude.T
+    ras = Longitude(np.arctan2(vectors[:, 1], vectors[:, 0]) * u.rad).to(u.deg)
+    decs = Latitude(np.arcsin(np.clip(vectors[:, 2], -1, 1)) * u.rad).to(u.deg)
 
-        # rotate about spacecraft z-axis first
-        vx_primed = rotate_vector(scx_vector, scz_vector, np.deg2rad(phi))
+    detector_radecs = {name: [ra, dec] for name, ra, dec in zip(names, ras, decs)}
+    detector_radecs["time"] = time
+    return detector_radecs
 
-        # now find spacecraft y-axis using cross product
-        vy_primed = np.cross(scz_vector, vx_primed)
 
-        # do the second part of the rotation around vy
-        vz_primed = rotate_vector(scz_vector, vy_primed, np.deg2rad(theta))
+def _radec_to_unit_vector(ra, dec):
+    """
+    Cartesian unit vectors for "RA/DEC" positions given in radians.
+    """
+    return np.stack(
+        [np.cos(ra) * np.cos(dec), np.sin(ra) * np.cos(dec), np.sin(dec)], axis=-1
+    )
 
-        # now we should be pointing at the new RA/DEC.
-        ra = Longitude(np.degrees(np.arctan2(vz_primed[1], vz_primed[0])) * u.deg)
-        dec = Latitude(np.degrees(np.arcsin(vz_primed[2])) * u.deg)
 
-        # save the RA/DEC in a dictionary
-        detector_radecs[l] = [ra, dec]
+def _spacecraft_attitude_matrices(scx_ra, scx_dec, scz_ra, scz_dec):
+    """
+    Rotation matrices from spacecraft coordinates to "RA/DEC" unit vectors.
 
-    detector_radecs["time"] = time
-    return detector_radecs
+    The columns of each matrix are the spacecraft x, y and z axes, given the
+    "RA/DEC" (in radians) of the spacecraft x and z axes. Scalar inputs give a
+    single (3, 3) matrix and array inputs a (N, 3, 3) stack.
+    """
+    scx_vector = _radec_to_unit_vector(scx_ra, scx_dec)
+    scz_vector = _radec_to_unit_vector(scz_ra, scz_dec)
+    scy_vector = np.cross(scz_vector, scx_vector)
+    return np.stack([scx_vector, scy_vector, scz_vector], axis=-1)
 
 
 def rotate_vector(vector, axis, theta):
@@ -1,7 +1,14 @@
+from collections import OrderedDict
+
 import astropy.units as u
+import matplotlib.pyplot as plt
+import numpy as np
 import pytest
-from numpy.testing import assert_almost_equal
-from sunpy.time import parse_time
+from astropy.coordinates import Latitude, Longitude
+from astropy.io import fits
+from numpy.testing import assert_allclose, assert_almost_equal, assert_array_equal
+from sunpy.coordinates import sun
+from sunpy.time import TimeRange, parse_time
 
 from sunkit_instruments import fermi
 
@@ -65,3 +72,168 @@ def test_detector_angles_2(pointing_file):
 def test_met_to_utc():
     time = fermi.met_to_utc(500000000)
     assert (time - parse_time("2016-11-05T00:53:16.000")) < 1e-7 * u.s
+
+
+@pytest.fixture
+def synthetic_pointing_file(tmp_path):
+    # A tiny weekly-file-like table with the spacecraft alternating between
+    # the day and night side of the Earth.
+    met_ref_time = parse_time("2001-01-01 00:00")
+    start = (parse_time("2012-02-15 00:00") - met_ref_time).to_value(u.s)
+    start = start + 60 * np.arange(4)
+    times = fermi.met_to_utc(start)
+    sun_ra = sun.apparent_rightascension(times).to_value(u.rad)
+    sun_dec = sun.apparent_declination(times).to_value(u.rad)
+    sun_vector = np.stack(
+        [
+            np.cos(sun_ra) * np.cos(sun_dec),
+            np.sin(sun_ra) * np.cos(sun_dec),
+            np.sin(sun_dec),
+        ],
+        axis=-1,
+    )
+    side = np.array([1, -1, 1, -1])[:, np.newaxis]
+    columns = [
+        fits.Column(name="START", format="D", array=start),
+        fits.Column(name="STOP", format="D", array=start + 60),
+        fits.Column(name="SC_POSITION", format="3E", array=side * sun_vector * 6.9e6),
+        fits.Column(name="IN_SAA", format="L", array=[False, False, True, True]),
+        fits.Column(name="RA_SCZ", format="E", array=[0, 10, 20, 30]),
+        fits.Column(name="DEC_SCZ", format="E", array=[0, 0, 0, 0]),
+        fits.Column(name="RA_SCX", format="E", array=[90, 100, 110, 120]),
+        fits.Column(name="DEC_SCX", format="E", array=[0, 0, 0, 0]),
+    ]
+    filename = tmp_path / "lat_spacecraft_synthetic.fits"
+    fits.HDUList([fits.PrimaryHDU(), fits.BinTableHDU.from_columns(columns)]).writeto(
+        filename
+    )
+    return str(filename)
+
+
+def test_sun_occultation_and_saa_flags(synthetic_pointing_file):
+    flags = fermi.get_sun_occultation_and_saa_flags(synthetic_pointing_file)
+    assert list(flags.keys()) == ["sun_occulted", "in_saa", "time"]
+    assert_array_equal(flags["sun_occulted"], [False, True, False, True])
+    assert_array_equal(flags["in_saa"], [False, False, True, True])
+    assert len(flags["time"]) == 4
+
+    tran = TimeRange("2012-02-15 00:00:30", "2012-02-15 00:02:30")
+    flags = fermi.get_sun_occultation_and_saa_flags(
+        synthetic_pointing_file, timerange=tran
+    )
+    assert_array_equal(flags["sun_occulted"], [True, False])
+    assert_array_equal(flags["in_saa"], [False, True])
+
+
+def test_detector_sun_angles_for_dates(synthetic_pointing_file, tmp_path, mocker):
+    expected = fermi.get_detector_sun_angles_for_date(
+        "2012-02-15", synthetic_pointing_file
+    )
+    cache_dir = tmp_path / "cache"
+    result = fermi.get_detector_sun_angles_for_dates(
+        ["2012-02-15"], synthetic_pointing_file, cache_dir=cache_dir, max_workers=1
+    )
+    assert list(result.keys()) == ["2012-02-15"]
+    angles = result["2012-02-15"]
+    assert len(angles["time"]) == 4
+    for i in range(12):
+        assert u.allclose(angles[f"n{i}"], expected[f"n{i}"], atol=1e-4 * u.deg)
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # A rerun is served from the cache without recomputing.
+    mocker.patch(
+        "sunkit_instruments.fermi.fermi.ProcessPoolExecutor",
+        side_effect=AssertionError("cache was not used"),
+    )
+    cached = fermi.get_detector_sun_angles_for_dates(
+        ["2012-02-15"], synthetic_pointing_file, cache_dir=cache_dir
+    )
+    assert u.allclose(cached["2012-02-15"]["n0"], angles["n0"])
+
+
+def test_detector_sun_angles_for_dates_cadence(synthetic_pointing_file):
+    result = fermi.get_detector_sun_angles_for_dates(
+        ["2012-02-15"], [synthetic_pointing_file], cadence=2 * u.min, max_workers=1
+    )
+    assert len(result["2012-02-15"]["time"]) == 2
+
+    with pytest.raises(ValueError, match="one pointing file per date"):
+        fermi.get_detector_sun_angles_for_dates(
+            ["2012-02-15", "2012-02-16"], [synthetic_pointing_file]
+        )
+
+
+def test_nai_detector_unit_vectors():
+    assert fermi.fermi.NAI_DETECTOR_UNIT_VECTORS.shape == (12, 3)
+    assert_allclose(np.linalg.norm(fermi.fermi.NAI_DETECTOR_UNIT_VECTORS, axis=1), 1)
+    detectors = fermi.fermi.nai_detector_angles()
+    assert list(detectors.keys()) == [f"n{i}" for i in range(12)]
+    assert detectors["n5"][0] == 3.35 * u.deg
+    assert detectors["n5"][1] == 89.79 * u.deg
+
+
+def test_nai_detector_radecs():
+    # Compare against successive Euler-Rodrigues rotations of the spacecraft axes
+    scx = (Longitude(117.0 * u.deg), Latitude(0.0 * u.deg))
+    scz = (Longitude(27.0 * u.deg), Latitude(0.0 * u.deg))
+    scx_vector = np.array([np.cos(np.deg2rad(117)), np.sin(np.deg2rad(117)), 0])
+    scz_vector = np.array([np.cos(np.deg2rad(27)), np.sin(np.deg2rad(27)), 0])
+
+    detectors = fermi.fermi.nai_detector_angles()
+    radecs = fermi.fermi.nai_detector_radecs(detectors, scx, scz, "2012-02-15")
+    assert radecs["time"] == "2012-02-15"
+    for name, (phi, theta) in detectors.items():
+        vx_primed = fermi.fermi.rotate_vector(
+            scx_vector, scz_vector, phi.to_value(u.rad)
+        )
+        vy_primed = np.cross(scz_vector, vx_primed)
+        vz_primed = fermi.fermi.rotate_vector(
+            scz_vector, vy_primed, theta.to_value(u.rad)
+        )
+        ra = Longitude(np.arctan2(vz_primed[1], vz_primed[0]) * u.rad)
+        dec = Latitude(np.arcsin(vz_primed[2]) * u.rad)
+        assert u.allclose(radecs[name][0], ra, atol=1e-8 * u.deg)
+        assert u.allclose(radecs[name][1], dec, atol=1e-8 * u.deg)
+
+
+def test_detector_sun_angles_for_date_matches_time(synthetic_pointing_file):
+    angles = fermi.get_detector_sun_angles_for_date(
+        "2012-02-15", synthetic_pointing_file
+    )
+    assert len(angles) == 13
+    assert len(angles["time"]) == 4
+    single = fermi.get_detector_sun_angles_for_time(
+        angles["time"][1], synthetic_pointing_file
+    )
+    for i in range(12):
+        assert u.allclose(angles[f"n{i}"][1], single[f"n{i}"], atol=1e-6 * u.deg)
+
+
+def test_plot_detector_sun_angles():
+    n_samples = 20000
+    times = parse_time("2012-02-15") + np.arange(n_samples) * 30 * u.s
+    angles = OrderedDict()
+    for i in range(12):
+        angles[f"n{i}"] = (90 + 80 * np.sin(np.arange(n_samples) / (100 + i))) * u.deg
+    angles["time"] = list(times)
+
+    fig, ax = plt.subplots()
+    lines = fermi.plot_detector_sun_angles(angles, axes=ax, max_points=400)
+    assert len(lines) == 12
+    for line, n in zip(lines, angles):
+        assert len(line.get_ydata()) <= 400
+        assert np.max(line.get_ydata()) == np.max(angles[n].value)
+        assert np.min(line.get_ydata()) == np.min(angles[n].value)
+        assert not line.get_animated()
+
+    lines = fermi.plot_detector_sun_angles(angles, axes=ax, animated=True)
+    assert all(line.get_animated() for line in lines)
+    assert len(lines[0].get_ydata()) <= 2 * ax.bbox.width
+
+    # a Time array draws the same as a list of times
+    list_x = lines[0].get_xdata()
+    angles["time"] = times
+    lines = fermi.plot_detector_sun_angles(angles, axes=ax)
+    assert_array_equal(lines[0].get_xdata(), list_x)
+    assert_array_equal(lines[0].get_xdata()[[0, -1]], times[[0, -1]].plot_date)
+    plt.close(fig)
@@ -1,3 +1,7 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
 import numpy as np
 import pandas as pd
 from astropy import units as u
@@ -8,13 +12,36 @@ from sunpy import timeseries as ts
 from sunpy.data import manager
 from sunpy.time import parse_time
 from sunpy.util.exceptions import warn_user
+from sunpy.util.util import hash_file
 
-__all__ = ["calculate_temperature_em"]
+__all__ = [
+    "calculate_temperature_em",
+    "calculate_temperature_em_batch",
+    "stream_temperature_em",
+]
 
 MAX_SUPPORTED_SATELLITE = 17
 
+# SHA-256 hash of goes_chianti_response_latest.fits
+_RESPONSE_TABLE_SHA256 = (
+    "4ca9730fb039e8a04407ae0aa4d5e3e2566b93dfe549157aa7c8fc3aa1e3e04d"
+)
+
+# Response splines already fitted in this process, keyed by the hash of the
+# response table file, the index in the table and the abundance, see
+# ``_response_splines``.
+_response_spline_cache = {}
+
+# Number of samples in the uniform grids of the ``method="table"`` lookup
+# tables, see ``_response_lookup_tables``.
+_lookup_table_size = 2**16
 
-def calculate_temperature_em(goes_ts, abundance="coronal"):
+_response_lookup_table_cache = {}
+
+
+def calculate_temperature_em(
+    goes_ts, abundance="coronal", cache_dir=None, method="spline", dtype=np.float64
+):
     """
     This function calculates the isothermal temperature and
     corresponding volume emission measure of the solar soft X-ray
@@ -41,6 +68,24 @@ def calculate_temperature_em(goes_ts, abundance="coronal"):
         The GOES/XRS timeseries containing the data of both the xrsa and xrsb channels (in units of W/m**2).
     abundance: {"coronal", "photospheric"}, optional
         Which abundances to use for the calculation, the default is "coronal".
+    cache_dir: `str`, optional
+        A directory in which to keep the response splines fitted to the CHIANTI
+        response table, so that other processes and sessions can reuse them.
+        Within a process the splines are always cached in memory, so repeated
+        calls do not read the response table or fit the splines again.
+        Defaults to `None`, not keeping them on disk.
+    method: {"spline", "table"}, optional
+        How to evaluate the response for each sample. The default "spline"
+        evaluates the spline fits to the response table. "table" instead
+        linearly interpolates dense lookup tables sampled from those splines
+        on uniform grids, which is several times faster for long time series.
+        The two methods differ by less than 1e-5 relative in both the
+        temperature and the emission measure.
+    dtype: {`numpy.float64`, `numpy.float32`}, optional
+        The type of the temperature and emission measure columns.
+        `numpy.float32` halves the memory used by the output, its emission
+        measure is then in units of 1e49 cm**-3 as float32 can not hold
+        values of ~1e49. Defaults to `numpy.float64`.
 
     Returns
     -------
@@ -100,17 +145,36 @@ def calculate_temperature_em(goes_ts, abundance="coronal"):
         raise ValueError(
             f"The abundance can only be `coronal` or `photospheric`, not {abundance}."
         )
+
+    if method not in ("spline", "table"):
+        raise ValueError(f'method must be "spline" or "table", not "{method}"')
+
+    if np.dtype(dtype) not in (np.float64, np.float32):
+        raise ValueError(f"dtype must be float64 or float32, not {dtype}")
+
     # Check if GOES-R and whether the primary detector values are given
     if satellite_number >= 16:
         if "xrsa_primary_chan" in goes_ts.columns:
             output = _manage_goesr_detectors(
-                goes_ts, satellite_number, abundance=abundance
+                goes_ts,
+                satellite_number,
+                abundance=abundance,
+                cache_dir=cache_dir,
+                method=method,
+                dtype=dtype,
             )
         else:
             warn_user(
                 "No information about primary/secondary detectors in XRSTimeSeries, assuming primary for all"
             )
-            output = _chianti_temp_emiss(goes_ts, satellite_number, abundance=abundance)
+            output = _chianti_temp_emiss(
+                goes_ts,
+                satellite_number,
+                abundance=abundance,
+                cache_dir=cache_dir,
+                method=method,
+                dtype=dtype,
+            )
 
     # Check if the older files are passed, and if so then the scaling factor needs to be removed.
     # The newer netcdf files now return "true" fluxes so this SWPC factor doesnt need to be removed.
@@ -126,20 +190,545 @@ def calculate_temperature_em(goes_ts, abundance="coronal"):
             satellite_number,
             abundance=abundance,
             remove_scaling=remove_scaling,
+            cache_dir=cache_dir,
+            method=method,
+            dtype=dtype,
         )
 
     return output
 
 
+def stream_temperature_em(
+    goes_data,
+    output,
+    abundance="coronal",
+    cache_dir=None,
+    method="spline",
+    dtype=np.float64,
+    chunk_size=2**16,
+):
+    """
+    Calculate the isothermal temperature and emission measure of many GOES XRS
+    observations, writing them to a HDF5 file as they are calculated.
+
+    Only one file or chunk of observations is held in memory at a time, so
+    the memory used stays the same however long the observations are, e.g. for
+    years of 1 s GOES-R data. Each sample is calculated exactly as in
+    `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+
+    Parameters
+    ----------
+    goes_data : iterable
+        The observations in time order, as an iterable (e.g. a generator) of
+        GOES XRS filenames that can be read by `sunpy.timeseries.TimeSeries`,
+        such as the FITS files of GOES 1-15 or the netCDF files of GOES 8-17,
+        or of `~sunpy.timeseries.sources.XRSTimeSeries` chunks.
+    output : `str`
+        The filename of the HDF5 file to write.
+    abundance: {"coronal", "photospheric"}, optional
+        Which abundances to use for the calculation, the default is "coronal".
+    cache_dir: `str`, optional
+        A directory in which to keep the response splines, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+    method: {"spline", "table"}, optional
+        How to evaluate the response for each sample, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+        Defaults to "spline".
+    dtype: {`numpy.float64`, `numpy.float32`}, optional
+        The type of the temperature and emission measure datasets, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+        Defaults to `numpy.float64`.
+    chunk_size : `int`, optional
+        The maximum number of samples calculated at once, longer files or
+        chunks are split up. This is also the number of samples in each chunk
+        of the HDF5 datasets. Defaults to 65536.
+
+    Returns
+    -------
+    `str`
+        The ``output`` filename. The file has a ``"time"`` dataset, the time of
+        each sample in seconds since 1970-01-01 (the Unix time), and the
+        ``"temperature"`` and ``"emission_measure"`` datasets, each with its
+        ``"unit"`` as an attribute.
+
+    Notes
+    -----
+    This requires `h5py`.
+
+    Examples
+    --------
+    >>> import glob
+    >>> from sunkit_instruments.goes_xrs import stream_temperature_em
+    >>> files = sorted(glob.glob("sci_xrsf-l2-flx1s_g16_*.nc"))  # doctest: +SKIP
+    >>> stream_temperature_em(files, "goes16_temperature_em.h5")  # doctest: +SKIP
+    'goes16_temperature_em.h5'
+    """
+    import h5py
+
+    units = {
+        "time": u.s,
+        "temperature": u.MK,
+        "emission_measure": _emission_measure_unit(dtype),
+    }
+    with h5py.File(output, "w") as h5file:
+        datasets = {}
+        for name, unit in units.items():
+            datasets[name] = h5file.create_dataset(
+                name,
+                shape=(0,),
+                maxshape=(None,),
+                dtype=np.float64 if name == "time" else dtype,
+                chunks=(chunk_size,),
+            )
+            datasets[name].attrs["unit"] = unit.to_string()
+        datasets["time"].attrs["reference"] = "1970-01-01T00:00:00 UTC"
+        h5file.attrs["abundance"] = abundance
+
+        def append(temp_em):
+            start = datasets["time"].shape[0]
+            columns = {
+                "time": temp_em._data.index.asi8 / 1e9,
+                "temperature": temp_em._data["temperature"].to_numpy(),
+                "emission_measure": temp_em._data["emission_measure"].to_numpy(),
+            }
+            for name, values in columns.items():
+                datasets[name].resize((start + values.size,))
+                datasets[name][start:] = values
+
+        for goes_ts in goes_data:
+            if not isinstance(goes_ts, ts.GenericTimeSeries):
+                goes_ts = ts.TimeSeries(goes_ts)
+            n_samples = len(goes_ts._data)
+            for start in range(0, n_samples, chunk_size):
+                chunk = goes_ts
+                if n_samples > chunk_size:
+                    chunk = ts.TimeSeries(
+                        goes_ts._data.iloc[start : start + chunk_size],
+                        goes_ts.meta.metas[0],
+                        goes_ts.units,
+                        source="xrs",
+                    )
+                append(
+                    calculate_temperature_em(
+                        chunk,
+                        abundance=abundance,
+                        cache_dir=cache_dir,
+                        method=method,
+                        dtype=dtype,
+                    )
+                )
+
+    return output
+
+
+def calculate_temperature_em_batch(
+    files,
+    abundance="coronal",
+    cache_dir=None,
+    method="spline",
+    dtype=np.float64,
+    workers=None,
+):
+    """
+    Calculate the isothermal temperature and emission measure of many GOES XRS
+    files in parallel, e.g. every day of several satellites.
+
+    The files are shared out between a pool of processes, each of which reads
+    the response table and fits the response splines only once. Only the times
+    and the calculated values are sent back from the processes, and these are
+    gathered into one table.
+
+    Parameters
+    ----------
+    files : `list`
+        The GOES XRS filenames, which can be read by `sunpy.timeseries.TimeSeries`.
+    abundance: {"coronal", "photospheric"}, optional
+        Which abundances to use for the calculation, the default is "coronal".
+    cache_dir: `str`, optional
+        A directory in which to keep the response splines, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+    method: {"spline", "table"}, optional
+        How to evaluate the response for each sample, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+        Defaults to "spline".
+    dtype: {`numpy.float64`, `numpy.float32`}, optional
+        The type of the temperature and emission measure columns, see
+        `~sunkit_instruments.goes_xrs.calculate_temperature_em`.
+        Defaults to `numpy.float64`.
+    workers : `int`, optional
+        The number of processes to use. Defaults to `None`, the number of
+        processors. 1 calculates the files in this process.
+
+    Returns
+    -------
+    `pandas.DataFrame`
+        The samples of all the files, in the order of ``files``, indexed by
+        ``"time"``. The columns are the ``"satellite"`` number, the
+        ``"temperature"`` in MK and the ``"emission_measure"``, in cm**-3 or,
+        for `numpy.float32`, in 1e49 cm**-3.
+
+    Examples
+    --------
+    >>> import glob
+    >>> from sunkit_instruments.goes_xrs import calculate_temperature_em_batch
+    >>> files = sorted(glob.glob("sci_xrsf-l2-flx1s_g1[67]_*.nc"))  # doctest: +SKIP
+    >>> temp_em = calculate_temperature_em_batch(files)  # doctest: +SKIP
+    >>> temp_em.groupby("satellite")["temperature"].max()  # doctest: +SKIP
+    """
+    calculate = partial(
+        _batch_temperature_em,
+        abundance=abundance,
+        cache_dir=cache_dir,
+        method=method,
+        dtype=dtype,
+    )
+    if workers == 1:
+        results = [calculate(filename) for filename in files]
+    else:
+        # make sure the response table is downloaded before the processes need it
+        _read_response_table()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(calculate, files))
+
+    if len(results) == 0:
+        times, satellites, temperatures, emission_measures = [], [], [], []
+    else:
+        times, satellites, temperatures, emission_measures = zip(*results)
+    sizes = [time.size for time in times]
+    return pd.DataFrame(
+        {
+            "satellite": np.repeat(np.array(satellites, dtype=np.uint8), sizes),
+            "temperature": np.concatenate(temperatures or [np.empty(0, dtype)]),
+            "emission_measure": np.concatenate(
+                emission_measures or [np.empty(0, dtype)]
+            ),
+        },
+        index=pd.DatetimeIndex(
+            np.concatenate(times or [np.empty(0, "datetime64[ns]")]), name="time"
+        ),
+        copy=False,
+    )
+
+
+def _batch_temperature_em(filename, **kwargs):
+    """
+    The times, satellite number, temperature and emission measure of a GOES XRS
+    file, for ``calculate_temperature_em_batch``.
+    """
+    goes_ts = ts.TimeSeries(filename)
+    temp_em = calculate_temperature_em(goes_ts, **kwargs)
+    return (
+        temp_em._data.index.to_numpy(),
+        int(goes_ts.observatory.split("-")[-1]),
+        temp_em._data["temperature"].to_numpy(),
+        temp_em._data["emission_measure"].to_numpy(),
+    )
+
+
 @manager.require(
     "goes_chianti_response_table",
     [
         "https://sohoftp.nascom.nasa.gov/solarsoft/gen/idl/synoptic/goes/goes_chianti_response_latest.fits"
     ],
-    "4ca9730fb039e8a04407ae0aa4d5e3e2566b93dfe549157aa7c8fc3aa1e3e04d",
+    _RESPONSE_TABLE_SHA256,
 )
+def _response_table_file():
+    """
+    The path of the GOES CHIANTI response table, goes_chianti_response_latest.fits.
+    """
+    return manager.get("goes_chianti_response_table")
+
+
+def _read_response_table():
+    """
+    Read the GOES CHIANTI response table, goes_chianti_response_latest.fits.
+    """
+    return fits.getdata(_response_table_file(), extension=1)
+
+
+def _response_table_hash():
+    """
+    The SHA-256 hash of the response table file in use, which differs from
+    ``_RESPONSE_TABLE_SHA256`` if the file is overridden.
+    """
+    resp_file_name = _response_table_file()
+    status = os.stat(resp_file_name)
+    return _hash_file(resp_file_name, status.st_mtime_ns, status.st_size)
+
+
+@lru_cache
+def _hash_file(path, mtime_ns, size):
+    """
+    The SHA-256 hash of a file, only computed again if the file is modified.
+    """
+    return hash_file(path)
+
+
+@lru_cache(maxsize=1)
+def _cached_response_table(table_hash=None):
+    """
+    The GOES CHIANTI response table, read once per process for each
+    ``table_hash``, the hash of the response table file from
+    ``_response_table_hash``.
+    """
+    return _read_response_table()
+
+
+def _response_splines(
+    satellite_number, secondary=0, abundance="coronal", cache_dir=None
+):
+    """
+    The spline representations used to get the temperature from the flux
+    ratio and the long channel flux from the temperature, for a GOES satellite,
+    detector combination and abundance.
+
+    The splines are cached in memory, so the response table is only read and
+    the splines only fitted once per process for each response table file,
+    response and abundance.
+
+    Parameters
+    ----------
+    satellite_number : `int`
+        GOES satellite number.
+    secondary : `int`, optional
+        Values 0, 1, 2, 3 indicate A1+B1, A2+B1, A1+B2, A2+B2 detector combos for GOES-R.
+        Defaults to 0.
+    abundance : {"coronal", "photospheric"}, optional
+        Which abundances to use for the calculation, the default is "coronal".
+    cache_dir : `str`, optional
+        A directory in which to also keep the splines as ``.npz`` files, so
+        that other processes and later sessions do not need to read the
+        response table or fit the splines again. The files are named after the
+        hash of the response table file, so a new or overridden response table
+        is never given the splines of another.
+
+    Returns
+    -------
+    `tuple`
+        The ``(t, c, k)`` representation of the ratio to temperature spline
+        and of the temperature to long channel flux (for an emission measure
+        of 1e49 cm**-3) spline, as used by `scipy.interpolate.splev`.
+    """
+    # Work out detector index to use from the table response based on satellite number
+    # The counting in the table starts at 0, and indexed in an odd way for the GOES-R
+    # primary/secondary detectors.
+    if satellite_number <= 15:
+        sat = satellite_number - 1  # counting starts at 0
+    else:
+        sat = (
+            15 + 4 * (satellite_number - 16) + secondary
+        )  # to figure out which detector response table to use (see notes)
+
+    # the splines in memory and on disk are only ever those of the response
+    # table file in use
+    table_hash = _response_table_hash()
+    key = (table_hash, sat, abundance)
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(
+            cache_dir,
+            f"goes_chianti_splines_{table_hash[:16]}_{sat}_{abundance}.npz",
+        )
+        if key not in _response_spline_cache and os.path.exists(cache_file):
+            with np.load(cache_file) as cached:
+                _response_spline_cache[key] = tuple(
+                    (cached[f"t{i}"], cached[f"c{i}"], int(cached[f"k{i}"]))
+                    for i in range(2)
+                )
+
+    if key not in _response_spline_cache:
+        _response_spline_cache[key] = _fit_response_splines(
+            sat, abundance, table_hash=table_hash
+        )
+
+    if cache_file is not None and not os.path.exists(cache_file):
+        os.makedirs(cache_dir, exist_ok=True)
+        arrays = {}
+        for i, (t, c, k) in enumerate(_response_spline_cache[key]):
+            arrays.update({f"t{i}": t, f"c{i}": c, f"k{i}": k})
+        # write to a temporary file first so other processes never see a
+        # partially written file
+        temporary_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+        np.savez(temporary_file, **arrays)
+        os.replace(temporary_file, cache_file)
+
+    return _response_spline_cache[key]
+
+
+def _fit_response_splines(sat, abundance="coronal", table_hash=None):
+    """
+    Fit the response splines for index ``sat`` of the response table with hash
+    ``table_hash``, see ``_response_splines``.
+    """
+    response_table = _cached_response_table(table_hash)
+    rcor = response_table.FSHORT_COR / response_table.FLONG_COR  # coronal
+    rpho = response_table.FSHORT_PHO / response_table.FLONG_PHO  # photospheric
+
+    table_to_response_em = 10.0 ** (
+        49.0 - response_table["ALOG10EM"][sat]
+    )  # for some reason in units of 1e49 (which was to stop overflow errors since 10^49 was
+    # too big to express as a standard float in IDL.)
+
+    modeltemp = response_table["TEMP_MK"][sat]
+    modelratio = rcor[sat] if abundance == "coronal" else rpho[sat]
+
+    # get spline fit to model data to get temperatures given the input flux ratio.
+    temperature_spline = interpolate.splrep(modelratio, modeltemp, s=0)
+
+    modelflux = (
+        response_table["FLONG_COR"][sat]
+        if abundance == "coronal"
+        else response_table["FLONG_PHO"][sat]
+    )
+
+    flux_spline = interpolate.splrep(modeltemp, modelflux * table_to_response_em, s=0)
+
+    return temperature_spline, flux_spline
+
+
+def _response_lookup_tables(
+    satellite_number, secondary=0, abundance="coronal", cache_dir=None
+):
+    """
+    Lookup tables of the response splines sampled on uniform grids.
+
+    The ratio to temperature spline is sampled uniformly in the logarithm of
+    the flux ratio and the temperature to flux spline uniformly in the
+    logarithm of the temperature, each over the range of the response table,
+    with ``_lookup_table_size`` samples. Like the splines, the tables are
+    cached in memory.
+
+    Parameters are as for ``_response_splines``.
+
+    Returns
+    -------
+    `tuple`
+        A ``(start, step, values)`` lookup table for each of the ratio to
+        temperature and temperature to flux splines, where ``values[i]`` is
+        the spline evaluated at ``10**(start + i * step)``.
+    """
+    splines = _response_splines(
+        satellite_number, secondary=secondary, abundance=abundance, cache_dir=cache_dir
+    )
+    key = (splines[0][0].tobytes(), splines[1][0].tobytes())
+    if key not in _response_lookup_table_cache:
+        lookup_tables = []
+        for spline in splines:
+            # the first and last knots of an interpolating spline are the ends
+            # of the data it was fitted to, a ratio of zero is left to the spline
+            knots = spline[0][spline[0] > 0]
+            start, stop = np.log10(knots[[0, -1]])
+            grid = np.linspace(start, stop, _lookup_table_size)
+            values = interpolate.splev(10**grid, spline, der=0)
+            values.flags.writeable = False
+            lookup_tables.append((start, grid[1] - grid[0], values))
+        _response_lookup_table_cache[key] = tuple(lookup_tables)
+    return _response_lookup_table_cache[key]
+
+
+def _interpolate_lookup_table(x, lookup_table, spline):
+    """
+    Evaluate ``spline`` at ``x`` by linear interpolation of ``lookup_table``.
+
+    Values outside the range of the lookup table, and NaNs, are passed to
+    the spline itself, so they get the same extrapolation as ``method="spline"``.
+    """
+    start, step, values = lookup_table
+    x = np.asarray(x, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        position = np.log10(x)
+        position -= start
+        position /= step
+        outside = ~((position >= 0) & (position <= values.size - 1))
+    has_outside = outside.any()
+    if has_outside:
+        # these are evaluated with the spline below
+        position[outside] = 0
+    index = np.minimum(position.astype(np.intp), values.size - 2)
+
+    # linear interpolation between the neighbouring samples, in place
+    position -= index
+    lower = values[index]
+    position *= values[index + 1] - lower
+    position += lower
+    if has_outside:
+        position[outside] = interpolate.splev(x[outside], spline, der=0)
+    return position
+
+
+def _emission_measure_unit(dtype):
+    """
+    The unit of the emission measures output as ``dtype``.
+
+    `numpy.float32` can not hold emission measures of ~1e49 cm**-3, so these
+    are in units of 1e49 cm**-3, as in the IDL code.
+    """
+    if np.dtype(dtype) == np.float32:
+        return u.Unit(1e49 * u.cm ** (-3))
+    return u.cm ** (-3)
+
+
+def _flux_array(goes_ts, column):
+    """
+    A copy of the flux of channel ``column`` of ``goes_ts`` in W/m**2, which can
+    be modified in place.
+    """
+    flux = goes_ts._data[column].to_numpy()
+    dtype = flux.dtype if np.issubdtype(flux.dtype, np.floating) else np.float64
+    flux = flux.astype(dtype, copy=True)
+    scale = goes_ts.units[column].to(u.W / u.m**2)
+    if scale != 1:
+        flux *= scale
+    return flux
+
+
+def _evaluate_response(
+    fluxratio,
+    satellite_number,
+    secondary=0,
+    abundance="coronal",
+    cache_dir=None,
+    method="spline",
+):
+    """
+    The temperature (in MK) and long channel flux for an emission measure of
+    1e49 cm**-3 of each flux ratio, for one detector combination.
+
+    Parameters are as for ``_chianti_temp_emiss``.
+    """
+    temperature_spline, flux_spline = _response_splines(
+        satellite_number, secondary=secondary, abundance=abundance, cache_dir=cache_dir
+    )
+
+    if method == "table":
+        temperature_table, flux_table = _response_lookup_tables(
+            satellite_number,
+            secondary=secondary,
+            abundance=abundance,
+            cache_dir=cache_dir,
+        )
+        temp = _interpolate_lookup_table(
+            fluxratio, temperature_table, temperature_spline
+        )
+        denom = _interpolate_lookup_table(temp, flux_table, flux_spline)
+    else:
+        # get spline fit to model data to get temperatures given the input flux ratio.
+        temp = interpolate.splev(fluxratio, temperature_spline, der=0)
+
+        denom = interpolate.splev(temp, flux_spline, der=0)
+
+    return temp, denom
+
+
 def _chianti_temp_emiss(
-    goes_ts, satellite_number, secondary=0, abundance="coronal", remove_scaling=False
+    goes_ts,
+    satellite_number,
+    secondary=0,
+    abundance="coronal",
+    remove_scaling=False,
+    cache_dir=None,
+    method="spline",
+    dtype=np.float64,
 ):
     """
     Calculate isothermal temperature and emission measure from GOES XRS observations.
@@ -156,8 +745,9 @@ def _chianti_temp_emiss(
         The GOES XRS timeseries containing the data of both the xrsa and xrsb channels (in units of W/m**2).
     sat : `int`
         GOES satellite number.
-    secondary: `int`, optional
+    secondary: `int` or `numpy.ndarray`, optional
         Values 0, 1, 2, 3 indicate A1+B1, A2+B1, A1+B2, A2+B2 detector combos for GOES-R.
+        Either one value for all the samples or an array with the value of each sample.
         Defaults to 0.
     abundance: {"coronal", "photospheric"}, optional
         Which abundances to use for the calculation, the default is "coronal".
@@ -165,6 +755,16 @@ def _chianti_temp_emiss(
         Checks whether to remove the SWPC scaling factors.
         This is only an issue for the older FITS files for GOES 8-15 XRS.
         Default is `False` as the netcdf files have the "true" fluxes.
+    cache_dir : `str`, optional
+        A directory in which to keep the fitted response splines, see
+        ``_response_splines``.
+    method : {"spline", "table"}, optional
+        Whether to evaluate the response splines directly or by interpolating
+        lookup tables of them, see ``_response_lookup_tables``.
+        Defaults to "spline".
+    dtype : `numpy.dtype`, optional
+        The type of the temperature and emission measure columns.
+        Defaults to `numpy.float64`.
 
     Returns
     -------
@@ -184,88 +784,80 @@ def _chianti_temp_emiss(
     the satellite number to be passed to this function should be the actual GOES satellite number.
     """
 
-    longflux = goes_ts.quantity("xrsb").to(u.W / u.m**2)
-    shortflux = goes_ts.quantity("xrsa").to(u.W / u.m**2)
+    # The fluxes are worked on in place in one copy of each channel, in W/m**2,
+    # rather than as a new Quantity for every step.
+    longflux = _flux_array(goes_ts, "xrsb")
+    shortflux = _flux_array(goes_ts, "xrsa")
 
     if "xrsb_quality" in goes_ts.columns:
-        longflux[goes_ts.to_dataframe()["xrsb_quality"] != 0] = np.nan
-        shortflux[goes_ts.to_dataframe()["xrsa_quality"] != 0] = np.nan
+        longflux[goes_ts._data["xrsb_quality"].to_numpy() != 0] = np.nan
+        shortflux[goes_ts._data["xrsa_quality"].to_numpy() != 0] = np.nan
 
     obsdate = parse_time(goes_ts._data.index[0])
 
-    longflux_corrected = longflux
     # For some reason that I can't find documented anywhere other than in the IDL code,
     # the long channel needs to be scaled by this value for GOES-6 before 1983-06-28.
     if obsdate <= Time("1983-06-28") and satellite_number == 6:
-        longflux_corrected = longflux * (4.43 / 5.32)
+        longflux *= 4.43 / 5.32
 
-    shortflux_corrected = shortflux
     # Remove the SWPC scaling factors if needed.
     # The SPWC scaling factors of 0.7 and 0.85 for the XRSA and XSRB channels
     # respectively are documented in the NOAA readme file linked in the docstring.
     if remove_scaling and satellite_number >= 8 and satellite_number < 16:
-        longflux_corrected = longflux_corrected / 0.7
-        shortflux_corrected = shortflux / 0.85
+        longflux /= 0.7
+        shortflux /= 0.85
 
     # Measurements of short channel flux of less than 1e-10 W/m**2 or
     # long channel flux less than 3e-8 W/m**2 are not considered good.
     # Ratio values corresponding to such fluxes are set to 0.003.
-    index = np.logical_or(
-        shortflux_corrected < u.Quantity(1e-10 * u.W / u.m**2),
-        longflux_corrected < u.Quantity(3e-8 * u.W / u.m**2),
-    )
-    fluxratio = shortflux_corrected / longflux_corrected
-    fluxratio.value[index] = u.Quantity(0.003, unit=u.dimensionless_unscaled)
-
-    # Work out detector index to use from the table response based on satellite number
-    # The counting in the table starts at 0, and indexed in an odd way for the GOES-R
-    # primary/secondary detectors.
-    if satellite_number <= 15:
-        sat = satellite_number - 1  # counting starts at 0
-    else:
-        sat = (
-            15 + 4 * (satellite_number - 16) + secondary
-        )  # to figure out which detector response table to use (see notes)
-
-    resp_file_name = manager.get("goes_chianti_response_table")
-    response_table = fits.getdata(resp_file_name, extension=1)
-    rcor = response_table.FSHORT_COR / response_table.FLONG_COR  # coronal
-    rpho = response_table.FSHORT_PHO / response_table.FLONG_PHO  # photospheric
-
-    table_to_response_em = 10.0 ** (
-        49.0 - response_table["ALOG10EM"][sat]
-    )  # for some reason in units of 1e49 (which was to stop overflow errors since 10^49 was
-    # too big to express as a standard float in IDL.)
-
-    modeltemp = response_table["TEMP_MK"][sat]
-    modelratio = rcor[sat] if abundance == "coronal" else rpho[sat]
+    index = shortflux < 1e-10
+    index |= longflux < 3e-8
+    # the short channel flux is not needed after the ratio
+    fluxratio = np.divide(shortflux, longflux, out=shortflux)
+    fluxratio[index] = 0.003
+    del index
 
     # Calculate the temperature and emission measure:
+    if np.ndim(secondary) == 0:
+        temp, denom = _evaluate_response(
+            fluxratio,
+            satellite_number,
+            secondary=int(secondary),
+            abundance=abundance,
+            cache_dir=cache_dir,
+            method=method,
+        )
+    else:
+        # evaluate each detector combination's response for its samples, in place
+        temp = np.empty(fluxratio.shape)
+        denom = np.empty(fluxratio.shape)
+        for combination in np.unique(secondary):
+            samples = secondary == combination
+            temp[samples], denom[samples] = _evaluate_response(
+                fluxratio[samples],
+                satellite_number,
+                secondary=int(combination),
+                abundance=abundance,
+                cache_dir=cache_dir,
+                method=method,
+            )
 
-    # get spline fit to model data to get temperatures given the input flux ratio.
-    spline = interpolate.splrep(modelratio, modeltemp, s=0)
-    temp = interpolate.splev(fluxratio, spline, der=0)
-
-    modelflux = (
-        response_table["FLONG_COR"][sat]
-        if abundance == "coronal"
-        else response_table["FLONG_PHO"][sat]
-    )
-
-    modeltemp = response_table["TEMP_MK"][sat]
-
-    spline = interpolate.splrep(modeltemp, modelflux * table_to_response_em, s=0)
-    denom = interpolate.splev(temp, spline, der=0)
-
-    emission_measure = longflux_corrected.value / denom
+    emission_measure = np.divide(longflux, denom, out=denom)
+    emission_measure_unit = _emission_measure_unit(dtype)
+    if emission_measure_unit == u.cm ** (-3):
+        emission_measure *= 1e49
 
     goes_times = goes_ts._data.index
     df = pd.DataFrame(
-        {"temperature": temp, "emission_measure": emission_measure * 1e49},
+        {
+            "temperature": temp.astype(dtype, copy=False),
+            "emission_measure": emission_measure.astype(dtype, copy=False),
+        },
         index=goes_times,
+        copy=False,
     )
 
-    units = {"temperature": u.MK, "emission_measure": u.cm ** (-3)}
+    units = {"temperature": u.MK, "emission_measure": emission_measure_unit}
 
     header = {"Info": "Estimated temperature and emission measure"}
 
@@ -275,7 +867,14 @@ def _chianti_temp_emiss(
     return temp_em
 
 
-def _manage_goesr_detectors(goes_ts, satellite_number, abundance="coronal"):
+def _manage_goesr_detectors(
+    goes_ts,
+    satellite_number,
+    abundance="coronal",
+    cache_dir=None,
+    method="spline",
+    dtype=np.float64,
+):
     """
     This manages which response to use for the GOES primary and secondary detectors used in the
     observations for the GOES-R satellites (i.e. GOES 16 and 17).
@@ -289,30 +888,26 @@ def _manage_goesr_detectors(goes_ts, satellite_number, abundance="coronal"):
     Here, we use the `xrsa{b}_primary_chan` columns to figure out which detectors are used for each timestep.
     """
 
-    # These are the conditions for which detector combinations to use.
-    secondary_det_conditions = {0: [1, 1], 1: [2, 1], 2: [1, 2], 3: [2, 2]}
-
-    # here we split the timeseries into sections for which primary or secondary detectors are used
-    # and then calculate the response for each and then concatenate them back together.
-    outputs = []
-    for k in secondary_det_conditions:
-        dets = secondary_det_conditions[k]
-        (second_ind,) = np.where(
-            (goes_ts.quantity("xrsa_primary_chan") == dets[0])
-            & (goes_ts.quantity("xrsb_primary_chan") == dets[1])
-        )
-
-        goes_split = ts.TimeSeries(goes_ts._data.iloc[second_ind], goes_ts.units)
-
-        if len(goes_split._data) > 0:
-            output = _chianti_temp_emiss(
-                goes_split, satellite_number, abundance=abundance, secondary=int(k)
-            )
-            outputs.append(output)
-
-    if len(outputs) > 1:
-        full_output = outputs[0].concatenate(outputs[1:])
-    else:
-        full_output = outputs[0]
-
-    return full_output
+    # The detector combination of each sample, the conditions being
+    # {0: [1, 1], 1: [2, 1], 2: [1, 2], 3: [2, 2]} for the xrsa and xrsb primary channels.
+    xrsa_primary_chan = goes_ts._data["xrsa_primary_chan"].to_numpy()
+    xrsb_primary_chan = goes_ts._data["xrsb_primary_chan"].to_numpy()
+    secondary = (xrsa_primary_chan == 2) + 2 * (xrsb_primary_chan == 2)
+
+    # samples which match none of the conditions are left out
+    valid = np.isin(xrsa_primary_chan, (1, 2)) & np.isin(xrsb_primary_chan, (1, 2))
+    if not valid.all():
+        goes_ts = ts.TimeSeries(goes_ts._data[valid], goes_ts.units)
+        secondary = secondary[valid]
+
+    # all the samples are calculated at once, each with its own response, so the
+    # output is in the same order as the input.
+    return _chianti_temp_emiss(
+        goes_ts,
+        satellite_number,
+        abundance=abundance,
+        secondary=secondary,
+        cache_dir=cache_dir,
+        method=method,
+        dtype=dtype,
+    )
@@ -64,6 +64,106 @@ def test_calculate_temperature_emiss_abundances():
         goes.calculate_temperature_em(goeslc, abundance="hello")
 
 
+@pytest.mark.parametrize(
+    "goes_files", [goes15_fits_filepath, goes15_filepath_nc, goes16_filepath_nc]
+)
+@pytest.mark.remote_data
+def test_calculate_temperature_em_table_method(goes_files):
+    goeslc = timeseries.TimeSeries(goes_files)
+    for abundance in ["coronal", "photospheric"]:
+        goes_temp_em = goes.calculate_temperature_em(goeslc, abundance=abundance)
+        goes_temp_em_table = goes.calculate_temperature_em(
+            goeslc, abundance=abundance, method="table"
+        )
+        assert np.all(goes_temp_em_table.time == goes_temp_em.time)
+        # the maximum deviation documented in calculate_temperature_em
+        for column in ["temperature", "emission_measure"]:
+            np.testing.assert_allclose(
+                goes_temp_em_table._data[column].values,
+                goes_temp_em._data[column].values,
+                rtol=1e-5,
+            )
+
+    # test when an unaccepted method is passed.
+    with pytest.raises(ValueError):
+        goes.calculate_temperature_em(goeslc, method="hello")
+
+
+@pytest.mark.remote_data
+def test_calculate_temperature_em_float32():
+    goeslc = timeseries.TimeSeries(goes16_filepath_nc)
+    data = goeslc._data.copy()
+    goes_temp_em = goes.calculate_temperature_em(goeslc)
+    goes_temp_em_32 = goes.calculate_temperature_em(goeslc, dtype=np.float32)
+    # the fluxes are masked and corrected in a copy, not in the input
+    assert data.equals(goeslc._data)
+
+    assert goes_temp_em_32._data.dtypes.tolist() == [np.float32, np.float32]
+    for column in ["temperature", "emission_measure"]:
+        assert u.allclose(
+            goes_temp_em_32.quantity(column),
+            goes_temp_em.quantity(column),
+            rtol=1e-6,
+            equal_nan=True,
+        )
+
+    with pytest.raises(ValueError):
+        goes.calculate_temperature_em(goeslc, dtype=np.int32)
+
+
+@pytest.mark.remote_data
+def test_stream_temperature_em(tmp_path):
+    pytest.importorskip("h5py")
+    import h5py
+
+    goes_files = [goes15_fits_filepath, goes15_filepath_nc, goes16_filepath_nc]
+    goes16 = timeseries.TimeSeries(goes16_filepath_nc)
+    # files and a timeseries split into chunks
+    output = goes.stream_temperature_em(
+        iter(goes_files + [goes16]), tmp_path / "temp_em.h5", chunk_size=1000
+    )
+
+    expected = [
+        goes.calculate_temperature_em(timeseries.TimeSeries(goes_file))._data
+        for goes_file in goes_files + [goes16_filepath_nc]
+    ]
+    with h5py.File(output, "r") as h5file:
+        assert h5file["time"].shape == (sum(len(data) for data in expected),)
+        np.testing.assert_allclose(
+            h5file["time"][:],
+            np.concatenate([data.index.asi8 / 1e9 for data in expected]),
+            rtol=0,
+            atol=1e-6,
+        )
+        for column in ["temperature", "emission_measure"]:
+            np.testing.assert_array_equal(
+                h5file[column][:],
+                np.concatenate([data[column].to_numpy() for data in expected]),
+            )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.remote_data
+def test_calculate_temperature_em_batch(workers):
+    goes_files = [goes15_fits_filepath, goes16_filepath_nc, goes15_filepath_nc]
+    temp_em = goes.calculate_temperature_em_batch(goes_files, workers=workers)
+
+    expected = [
+        goes.calculate_temperature_em(timeseries.TimeSeries(goes_file))._data
+        for goes_file in goes_files
+    ]
+    assert temp_em.index.name == "time"
+    assert np.all(temp_em.index == np.concatenate([data.index for data in expected]))
+    assert_array_equal(
+        temp_em["satellite"],
+        np.repeat([15, 16, 15], [len(data) for data in expected]),
+    )
+    for column in ["temperature", "emission_measure"]:
+        assert_array_equal(
+            temp_em[column], np.concatenate([data[column] for data in expected])
+        )
+
+
 @pytest.mark.remote_data
 def test_calculate_temperature_emiss_errs():
     # check when not a XRS timeseries is passed
@@ -87,6 +187,119 @@ def test_calculate_temperature_emiss_no_primary_detector_columns_GOESR():
         goes.calculate_temperature_em(goeslc_removed_col)
 
 
+@pytest.mark.remote_data
+def test_calculate_temperature_em_detector_combinations():
+    goeslc = timeseries.TimeSeries(goes16_filepath_nc)
+    goes_temp_em = goes.calculate_temperature_em(goeslc)
+    # all the detector combinations are in the test file
+    primary_chan = goeslc._data[["xrsa_primary_chan", "xrsb_primary_chan"]]
+    assert len(primary_chan.drop_duplicates()) > 1
+
+    # the output is in the order of the input, samples without valid detectors are left out
+    data = goeslc._data.iloc[::-1].copy()
+    data.iloc[:10, data.columns.get_loc("xrsa_primary_chan")] = 0
+    shuffled = timeseries.TimeSeries(data, goeslc.meta, goeslc.units, source="xrs")
+    shuffled_temp_em = goes.calculate_temperature_em(shuffled)
+    assert np.all(shuffled_temp_em._data.index == data.index[10:])
+    for column in ["temperature", "emission_measure"]:
+        assert_array_equal(
+            shuffled_temp_em._data[column].values,
+            goes_temp_em._data[column].values[::-1][10:],
+        )
+
+
+@pytest.mark.remote_data
+def test_calculate_temperature_em_response_cache(mocker, tmp_path):
+    goeslc = timeseries.TimeSeries(goes16_filepath_nc)
+    goes.goes_chianti_tem._response_spline_cache.clear()
+    goes.goes_chianti_tem._cached_response_table.cache_clear()
+    read_table = mocker.spy(goes.goes_chianti_tem, "_read_response_table")
+
+    goes_temp_em = goes.calculate_temperature_em(goeslc, cache_dir=tmp_path)
+    # the table is read once for all the detector combinations
+    assert read_table.call_count == 1
+    assert len(list(tmp_path.glob("*.npz"))) > 1
+
+    # cached in memory
+    goes.calculate_temperature_em(goeslc)
+    assert read_table.call_count == 1
+
+    # cached on disk
+    goes.goes_chianti_tem._response_spline_cache.clear()
+    goes.goes_chianti_tem._cached_response_table.cache_clear()
+    goes_temp_em_cached = goes.calculate_temperature_em(goeslc, cache_dir=tmp_path)
+    assert read_table.call_count == 1
+    assert_array_equal(
+        goes_temp_em_cached._data["temperature"], goes_temp_em._data["temperature"]
+    )
+    assert_array_equal(
+        goes_temp_em_cached._data["emission_measure"],
+        goes_temp_em._data["emission_measure"],
+    )
+
+
+def test_response_splines_cache_file(mocker, tmp_path):
+    table_file = tmp_path / "goes_chianti_response_latest.fits"
+    mocker.patch.object(
+        goes.goes_chianti_tem, "_response_table_file", return_value=table_file
+    )
+
+    def fit_response_splines(sat, abundance="coronal", table_hash=None):
+        # splines which tell which response table they were fitted to
+        value = len(table_file.read_bytes())
+        return tuple((np.linspace(0, 1, 8), np.full(8, value), 3) for _ in range(2))
+
+    fit = mocker.patch.object(
+        goes.goes_chianti_tem,
+        "_fit_response_splines",
+        side_effect=fit_response_splines,
+    )
+    cache_dir = tmp_path / "cache"
+
+    def cached_values():
+        values = {}
+        for cache_file in cache_dir.glob("*.npz"):
+            with np.load(cache_file) as cached:
+                values[cache_file.name] = cached["c0"][0]
+        return values
+
+    try:
+        table_file.write_bytes(b"first table")
+        goes.goes_chianti_tem._response_spline_cache.clear()
+        goes.goes_chianti_tem._response_splines(16, cache_dir=cache_dir)
+        first_values = cached_values()
+        assert list(first_values.values()) == [len(b"first table")]
+
+        goes.goes_chianti_tem._response_spline_cache.clear()
+        goes.goes_chianti_tem._response_splines(16, cache_dir=cache_dir)
+        assert fit.call_count == 1
+        assert cached_values() == first_values
+
+        # a changed response table does not use the splines of the old one
+        table_file.write_bytes(b"second table")
+        goes.goes_chianti_tem._response_spline_cache.clear()
+        splines = goes.goes_chianti_tem._response_splines(16, cache_dir=cache_dir)
+        assert fit.call_count == 2
+        assert splines[0][1][0] == len(b"second table")
+        values = cached_values()
+        assert len(values) == 2
+        assert sorted(values.values()) == [len(b"first table"), len(b"second table")]
+
+        # nor do the splines of the old table fitted in memory without a cache
+        # directory get written to the cache file of the new table
+        table_file.write_bytes(b"the third table")
+        goes.goes_chianti_tem._response_spline_cache.clear()
+        goes.goes_chianti_tem._response_splines(16)
+        table_file.write_bytes(b"the fourth table")
+        splines = goes.goes_chianti_tem._response_splines(16, cache_dir=cache_dir)
+        assert fit.call_count == 4
+        assert splines[0][1][0] == len(b"the fourth table")
+        new_values = set(cached_values().items()) - set(values.items())
+        assert [value for _, value in new_values] == [len(b"the fourth table")]
+    finally:
+        goes.goes_chianti_tem._response_spline_cache.clear()
+
+
 # We also test against the IDL outputs for the GOES-15 and 16 test files
 idl_chianti_tem_15 = get_test_filepath("goes_15_test_chianti_tem_idl.sav")
 idl_chianti_tem_16 = get_test_filepath("goes_16_test_chianti_tem_idl.sav")
@@ -99,8 +312,9 @@ idl_chianti_tem_16 = get_test_filepath("goes_16_test_chianti_tem_idl.sav")
         (goes16_filepath_nc, idl_chianti_tem_16),
     ],
 )
+@pytest.mark.parametrize("method", ["spline", "table"])
 @pytest.mark.remote_data
-def test_comparison_with_IDL_version(goes_files, idl_files):
+def test_comparison_with_IDL_version(goes_files, idl_files, method):
     """
     Test that the outputs are the same for the IDL functionality goes_chianti_tem.pro.
     To create the test sav files in IDL:
@@ -119,7 +333,7 @@ def test_comparison_with_IDL_version(goes_files, idl_files):
 
     """
     goeslc = timeseries.TimeSeries(goes_files)
-    goes_temp_em = goes.calculate_temperature_em(goeslc)
+    goes_temp_em = goes.calculate_temperature_em(goeslc, method=method)
 
     idl_output = readsav(idl_files)
     # in the sunkit-instr version we only calculate the temp/emission measure for
@@ -1,12 +1,17 @@
+import mmap
 import platform
+import shutil
 import textwrap
+import tracemalloc
 from distutils.version import LooseVersion
 from unittest import mock
 
+import astropy.units as u
 import numpy as np
 import pytest
 import sunpy.io
 import sunpy.map
+from astropy.io import fits
 from sunpy.time import is_time_equal, parse_time
 
 from sunkit_instruments import rhessi
@@ -34,6 +39,438 @@ def test_backprojection():
     assert is_time_equal(amap.date, parse_time((2002, 2, 20, 11, 6, 21)))
 
 
+def test_backprojection_reads_file_once(mocker):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    fits_open = mocker.spy(rhessi.rhessi.fits, "open")
+    rhessi.backprojection(get_test_filepath(test_filename))
+    assert fits_open.call_count == 1
+
+
+def test_backprojection_memory_budget():
+    """
+    Test that a tiled backprojection gives the same image.
+    """
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    reference = rhessi.backprojection(get_test_filepath(test_filename))
+    tiled = rhessi.backprojection(
+        get_test_filepath(test_filename), memory_budget=16 * 1024
+    )
+    np.testing.assert_allclose(tiled.data, reference.data, rtol=1e-12)
+
+
+def test_sum_detector_backprojections_memory_budget():
+    """
+    Test that the detectors share their scratch arrays, so the memory used does
+    not grow with the number of detectors.
+    """
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    event_list = rhessi.rhessi._read_calibrated_event_list(
+        get_test_filepath(test_filename)
+    )
+    detector_terms = [
+        rhessi.rhessi._detector_imaging_terms(event_list["events"][detector], detector)
+        for detector in event_list["detectors"]
+    ]
+    memory_budget = 2**20
+    image_dim = (128, 128)
+    tracemalloc.start()
+    try:
+        rhessi.rhessi._sum_detector_backprojections(
+            detector_terms, (1.0, 1.0), image_dim, memory_budget
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 * memory_budget + 8 * 8 * image_dim[0] * image_dim[1]
+
+
+@pytest.mark.parametrize("memory_budget", [2**26, 16 * 1024])
+def test_backprojection_workers(memory_budget):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    reference = rhessi.backprojection(
+        get_test_filepath(test_filename), memory_budget=memory_budget
+    )
+    threaded = rhessi.backprojection(
+        get_test_filepath(test_filename), memory_budget=memory_budget, workers=4
+    )
+    np.testing.assert_allclose(threaded.data, reference.data, rtol=1e-12)
+    assert threaded.date == reference.date
+
+    # The result is reproducible from run to run
+    again = rhessi.backprojection(
+        get_test_filepath(test_filename), memory_budget=memory_budget, workers=4
+    )
+    np.testing.assert_array_equal(again.data, threaded.data)
+
+
+def test_backprojection_workers_detectors_concurrent(mocker):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    log = []
+    executors = []
+    scratch = set()
+
+    class RecordingExecutor(rhessi.rhessi.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            executors.append(self)
+
+        def submit(self, task, *args, **kwargs):
+            future = super().submit(task, *args, **kwargs)
+            # the per-event terms of the block the task backprojects
+            terms = task.args[2]
+            log.append(("submit", id(terms)))
+            scratch.add(id(task.args[4]))
+            result = future.result
+
+            def logged_result(*args, **kwargs):
+                log.append(("result", id(terms)))
+                return result(*args, **kwargs)
+
+            future.result = logged_result
+            return future
+
+    mocker.patch.object(rhessi.rhessi, "ThreadPoolExecutor", RecordingExecutor)
+    threaded = rhessi.backprojection(get_test_filepath(test_filename), workers=4)
+    assert len(executors) == 1
+
+    first_result = [event for event, _ in log].index("result")
+    submitted = {terms for _, terms in log[:first_result]}
+    # the tasks of several detectors are submitted before any is collected,
+    # but no more than ``workers`` blocks at a time
+    assert 1 < len(submitted) <= 4
+    # all the blocks share one set of scratch arrays per thread
+    assert len(scratch) == 1
+
+    reference = rhessi.backprojection(get_test_filepath(test_filename))
+    np.testing.assert_allclose(threaded.data, reference.data, rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    ("image_dim", "pixel_size"),
+    [((64, 64), (1, 1)), ((128, 128), (2, 2)), ((40, 64), (1, 1))],
+)
+def test_backprojection_float32(image_dim, pixel_size):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    kwargs = {"image_dim": image_dim * u.pix, "pixel_size": pixel_size * u.arcsec}
+    reference = rhessi.backprojection(get_test_filepath(test_filename), **kwargs)
+    single = rhessi.backprojection(
+        get_test_filepath(test_filename), dtype=np.float32, **kwargs
+    )
+    assert single.data.dtype == np.float32
+    assert reference.data.dtype == np.float64
+    np.testing.assert_allclose(
+        single.data, reference.data, rtol=0, atol=1e-6 * reference.data.max()
+    )
+
+
+@pytest.mark.parametrize(
+    ("image_dim", "pixel_size", "memory_budget"),
+    [
+        ((64, 64), (1, 1), 2**26),
+        ((128, 128), (2, 2), 2**26),
+        ((40, 64), (1, 1), 2**26),
+        ((63, 63), (1, 1), 16 * 1024),
+    ],
+)
+def test_backprojection_fft(image_dim, pixel_size, memory_budget):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    kwargs = {"image_dim": image_dim * u.pix, "pixel_size": pixel_size * u.arcsec}
+    reference = rhessi.backprojection(get_test_filepath(test_filename), **kwargs)
+    fft = rhessi.backprojection(
+        get_test_filepath(test_filename),
+        method="fft",
+        memory_budget=memory_budget,
+        **kwargs,
+    )
+    assert fft.data.shape == reference.data.shape
+    assert fft.date == reference.date
+    np.testing.assert_allclose(
+        fft.data, reference.data, rtol=0, atol=1e-6 * reference.data.max()
+    )
+
+
+def test_backprojection_invalid_method():
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    with pytest.raises(ValueError, match="method"):
+        rhessi.backprojection(get_test_filepath(test_filename), method="clean")
+
+
+@pytest.mark.parametrize("chunk_size", [2**16, 100, 1])
+def test_calibrated_event_list_visibilities(chunk_size):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    filename = get_test_filepath(test_filename)
+    vis = rhessi.calibrated_event_list_visibilities(filename, chunk_size=chunk_size)
+    events = rhessi.rhessi._read_calibrated_event_list(filename)["events"]
+    assert sorted(vis) == list(range(1, 9))
+    for detector, detector_vis in vis.items():
+        detector_events = {
+            name: np.asarray(value, dtype=float)
+            for name, value in events[detector].items()
+        }
+        roll_angle = np.unique(detector_events["roll_angle"])
+        np.testing.assert_array_equal(detector_vis["roll_angle"], roll_angle)
+        assert detector_vis["u"].unit == 1 / u.arcsec
+        np.testing.assert_allclose(
+            np.hypot(detector_vis["u"], detector_vis["v"]).value,
+            1 / rhessi.rhessi.grid_pitch[detector - 1],
+        )
+        # the visibility of the first roll angle bin
+        in_bin = detector_events["roll_angle"] == roll_angle[0]
+        expected = np.sum(
+            (
+                detector_events["count"]
+                * detector_events["modamp"]
+                * detector_events["gridtran"]
+                * np.exp(1j * detector_events["phase_map_ctr"])
+            )[in_bin]
+        )
+        np.testing.assert_allclose(detector_vis["visibility"][0], expected)
+        np.testing.assert_allclose(
+            detector_vis["flux"].sum(),
+            np.sum(detector_events["count"] * detector_events["gridtran"]),
+        )
+
+
+def test_nufft_image():
+    rng = np.random.default_rng(0)
+    theta_x, theta_y = rng.uniform(-10, 10, (2, 50))
+    weights = rng.normal(size=50) + 1j * rng.normal(size=50)
+    index_y, index_x = np.meshgrid(np.arange(9), np.arange(9), indexing="ij")
+    expected = np.sum(
+        weights
+        * np.exp(1j * (theta_x * index_x[..., None] + theta_y * index_y[..., None])),
+        axis=-1,
+    )
+    image = rhessi.rhessi._nufft_image(theta_x, theta_y, weights, 9, 2**20)
+    np.testing.assert_allclose(image, expected, rtol=0, atol=1e-10)
+
+
+def test_pixel_coordinates():
+    pixel_x, pixel_y = rhessi.rhessi._pixel_coordinates((4, 4), 2.0, "<f8")
+    offsets = 2.0 * (np.arange(4) - 1.5)
+    grid_y, grid_x = np.meshgrid(offsets, offsets, indexing="ij")
+    np.testing.assert_array_equal(pixel_x, grid_x.ravel())
+    np.testing.assert_array_equal(pixel_y, grid_y.ravel())
+
+    # cached and shared between calls, so must not be writeable
+    assert rhessi.rhessi._pixel_coordinates((4, 4), 2.0, "<f8")[0] is pixel_x
+    assert not pixel_x.flags.writeable
+    assert rhessi.rhessi._pixel_coordinates((4, 4), 2.0, "<f4")[0].dtype == np.float32
+
+
+def test_pixel_coordinates_non_square():
+    image_dim = (4, 6)
+    tempa = (np.arange(24) % 4) - 1.5
+    tempb = tempa.reshape(image_dim).transpose().reshape(24)
+    pixel_x, pixel_y = rhessi.rhessi._pixel_coordinates(image_dim, 1.0, "<f8")
+    np.testing.assert_array_equal(pixel_x, tempa)
+    np.testing.assert_array_equal(pixel_y, tempb)
+
+
+@pytest.mark.parametrize(
+    ("n_pixels", "n_events", "memory_budget"),
+    [
+        (4096, 768, 2**26),
+        (4096, 768, 2**16),
+        (262144, 10**5, 2**26),
+        (10, 10**7, 2**20),
+    ],
+)
+def test_backprojection_block_shape(n_pixels, n_events, memory_budget):
+    pixel_block, event_block = rhessi.rhessi._backprojection_block_shape(
+        n_pixels, n_events, memory_budget, 8
+    )
+    assert 1 <= pixel_block <= n_pixels
+    assert 1 <= event_block <= n_events
+    assert 2 * 8 * pixel_block * event_block <= memory_budget
+
+
+def test_read_calibrated_event_list():
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    event_list = rhessi.rhessi._read_calibrated_event_list(
+        get_test_filepath(test_filename)
+    )
+    assert event_list["detectors"] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert list(event_list["events"].keys()) == event_list["detectors"]
+    assert event_list["events"][1]["count"].shape == (768,)
+    assert event_list["events"][8]["roll_angle"].shape == (72,)
+    assert set(event_list["events"][8].keys()) == {
+        "phase_map_ctr",
+        "roll_angle",
+        "modamp",
+        "gridtran",
+        "count",
+    }
+
+
+@pytest.fixture
+def unstacked_calibrated_event_list(tmp_path):
+    """
+    The test calibrated event list with a time added to each event, spreading
+    the events of each detector evenly over 40 seconds.
+
+    As in real unstacked event lists, the times are integers counted from
+    ``UT_REF`` in units of ``TIME_UNIT`` binary microseconds (2**-20 s).
+    """
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    time_unit = 16
+    with fits.open(get_test_filepath(test_filename)) as hdulist:
+        hdus = [hdulist[0].copy(), hdulist[1].copy(), hdulist[2].copy()]
+        hdus[1].data["TIME_UNIT"][0] = time_unit
+        hdus[2].data["SEC2TIME_UNIT"][0] = 2**20 / time_unit
+        for hdu in hdulist[3:]:
+            n_events = len(hdu.data)
+            seconds = 2 + 40 * np.arange(n_events) / n_events
+            columns = hdu.columns + fits.ColDefs(
+                [
+                    fits.Column(
+                        name="TIME",
+                        format="J",
+                        array=np.round(seconds * 2**20 / time_unit).astype(np.int32),
+                    )
+                ]
+            )
+            hdus.append(fits.BinTableHDU.from_columns(columns, header=hdu.header))
+        filename = tmp_path / "hsi_calib_ev_unstacked.fits"
+        fits.HDUList(hdus).writeto(filename)
+    return str(filename)
+
+
+@pytest.mark.parametrize("chunk_size", [2**20, 100, 1])
+def test_iter_calibrated_event_list(chunk_size, unstacked_calibrated_event_list):
+    event_list = rhessi.rhessi._read_calibrated_event_list(
+        unstacked_calibrated_event_list
+    )
+    blocks = list(
+        rhessi.iter_calibrated_event_list(
+            unstacked_calibrated_event_list, chunk_size=chunk_size
+        )
+    )
+    assert all(len(events["count"]) <= chunk_size for _, events in blocks)
+    detectors = [detector for detector, _ in blocks]
+    assert detectors == sorted(detectors)
+    assert sorted(set(detectors)) == event_list["detectors"]
+    for detector in event_list["detectors"]:
+        for name, column in event_list["events"][detector].items():
+            np.testing.assert_array_equal(
+                np.concatenate(
+                    [
+                        events[name]
+                        for block_detector, events in blocks
+                        if block_detector == detector
+                    ]
+                ),
+                column,
+            )
+
+
+def test_iter_calibrated_event_list_columns():
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    blocks = list(
+        rhessi.iter_calibrated_event_list(
+            get_test_filepath(test_filename), detectors=[3, 5], columns=["count"]
+        )
+    )
+    assert [detector for detector, _ in blocks] == [3, 5]
+    assert all(list(events) == ["count"] for _, events in blocks)
+
+
+@pytest.mark.parametrize("method", ["direct", "fft"])
+@pytest.mark.parametrize("chunk_size", [100, 50])
+def test_backprojection_chunk_size(method, chunk_size):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    reference = rhessi.backprojection(get_test_filepath(test_filename), method=method)
+    chunked = rhessi.backprojection(
+        get_test_filepath(test_filename), method=method, chunk_size=chunk_size
+    )
+    np.testing.assert_allclose(chunked.data, reference.data, rtol=1e-12)
+
+
+def test_backprojection_sequence(unstacked_calibrated_event_list):
+    ut_ref = parse_time(730206358.0, format="utime")
+    whole = sunpy.time.TimeRange(ut_ref, ut_ref + 60 * u.s)
+    first = sunpy.time.TimeRange(ut_ref, ut_ref + 22 * u.s)
+    second = sunpy.time.TimeRange(ut_ref + 22 * u.s, ut_ref + 60 * u.s)
+
+    movie = rhessi.backprojection_sequence(
+        unstacked_calibrated_event_list, [whole, first, second]
+    )
+    assert isinstance(movie, sunpy.map.MapSequence)
+    assert len(movie) == 3
+    assert is_time_equal(movie[1].date, first.center)
+
+    # the event times are in units of TIME_UNIT binary microseconds
+    event_list = rhessi.rhessi._read_calibrated_event_list(
+        unstacked_calibrated_event_list
+    )
+    assert event_list["time_unit"] == 16 / 2**20
+
+    reference = rhessi.backprojection(unstacked_calibrated_event_list)
+    np.testing.assert_allclose(movie[0].data, reference.data, rtol=1e-12)
+    # the images are linear in the events, so the halves add up to the whole
+    np.testing.assert_allclose(movie[1].data + movie[2].data, movie[0].data, rtol=1e-10)
+    assert not np.allclose(movie[1].data, movie[2].data)
+
+    threaded = rhessi.backprojection_sequence(
+        unstacked_calibrated_event_list, [first, second], workers=3
+    )
+    np.testing.assert_allclose(threaded[0].data, movie[1].data, rtol=1e-12)
+    np.testing.assert_allclose(threaded[1].data, movie[2].data, rtol=1e-12)
+
+
+def test_backprojection_sequence_stacked():
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    # SEC2TIME_UNIT is 0 in stacked event lists, the unit comes from TIME_UNIT
+    event_list = rhessi.rhessi._read_calibrated_event_list(
+        get_test_filepath(test_filename)
+    )
+    assert event_list["time_unit"] == 2**-20
+
+    with pytest.raises(ValueError, match="unstacked"):
+        rhessi.backprojection_sequence(
+            get_test_filepath(test_filename),
+            [sunpy.time.TimeRange("2002-02-20 11:06", "2002-02-20 11:07")],
+        )
+
+
+@pytest.mark.parametrize("chunk_size", [2**16, 100])
+def test_calibrated_event_list_visibilities_binned(
+    chunk_size, unstacked_calibrated_event_list
+):
+    test_filename = "hsi_calib_ev_20020220_1106_20020220_1106_25_40.fits"
+    exact = rhessi.calibrated_event_list_visibilities(get_test_filepath(test_filename))
+    # unstacked event lists are binned by default
+    default = rhessi.calibrated_event_list_visibilities(
+        unstacked_calibrated_event_list, chunk_size=chunk_size
+    )
+    binned = rhessi.calibrated_event_list_visibilities(
+        unstacked_calibrated_event_list, chunk_size=chunk_size, roll_angle_bins=64
+    )
+    for detector, detector_vis in binned.items():
+        assert 0 < detector_vis["roll_angle"].size <= 64
+        assert default[detector]["roll_angle"].size <= 8192
+        bins = np.floor(detector_vis["roll_angle"] / (2 * np.pi / 64))
+        assert np.unique(bins).size == bins.size
+        for name in ["visibility", "flux"]:
+            np.testing.assert_allclose(
+                detector_vis[name].sum(), exact[detector][name].sum()
+            )
+        np.testing.assert_allclose(
+            np.hypot(detector_vis["u"], detector_vis["v"]).value,
+            1 / rhessi.rhessi.grid_pitch[detector - 1],
+        )
+
+
+def test_backprojection_fft_unstacked(unstacked_calibrated_event_list):
+    reference = rhessi.backprojection(unstacked_calibrated_event_list)
+    fft = rhessi.backprojection(
+        unstacked_calibrated_event_list, method="fft", chunk_size=1000
+    )
+    np.testing.assert_allclose(
+        fft.data, reference.data, rtol=0, atol=1e-6 * reference.data.max()
+    )
+
+
 def test_parse_obssum_dbase_file():
     fname = get_test_filepath("hsi_obssumm_filedb_201104.txt")
     obssum = rhessi.parse_observing_summary_dbase_file(fname)
@@ -98,6 +535,119 @@ def test_get_parse_obssum_hdulist():
     assert header.get("TELESCOP") == "HESSI"
 
 
+@pytest.mark.parametrize("uncompressed", [False, True])
+@pytest.mark.parametrize(
+    ("bands", "band_indices", "time_range"),
+    [
+        (None, list(range(9)), None),
+        ([1, "25 - 50 keV"], [1, 3], None),
+        (0, [0], ("2011-04-04 10:00:02", "2011-04-04 11:00")),
+        (None, list(range(9)), ("2011-04-03 23:00", "2011-04-04 00:00:05")),
+        (8, [8], ("2011-04-05 12:00", "2011-04-06")),
+    ],
+)
+def test_read_observing_summary(
+    bands, band_indices, time_range, uncompressed, tmp_path
+):
+    filename = get_test_filepath("hsi_obssumm_20110404_042.fits.gz")
+    hdulist = sunpy.io.read_file(filename)
+    expected_header, expected = rhessi.parse_observing_summary_hdulist(hdulist)
+    if uncompressed:
+        with fits.open(filename) as hdul:
+            filename = tmp_path / "hsi_obssumm_20110404_042.fits"
+            hdul.writeto(filename)
+
+    if time_range is not None:
+        time_range = sunpy.time.TimeRange(time_range)
+    header, data = rhessi.read_observing_summary(
+        filename, bands=bands, time_range=time_range
+    )
+    assert header["DATE_OBS"] == expected_header["DATE_OBS"]
+
+    rows = np.ones(len(expected["time"]), dtype=bool)
+    if time_range is not None:
+        rows = (expected["time"] >= time_range.start) & (
+            expected["time"] < time_range.end
+        )
+    np.testing.assert_array_equal(data["data"], expected["data"][rows][:, band_indices])
+    assert data["labels"] == [expected["labels"][band] for band in band_indices]
+    assert data["time_step"] == 4 * u.s
+    if rows.any():
+        assert is_time_equal(data["time_start"], expected["time"][rows][0])
+
+
+@pytest.mark.parametrize("index", [0, 1, 389, 1000, 21589])
+def test_read_observing_summary_on_samples(index):
+    filename = get_test_filepath("hsi_obssumm_20110404_042.fits.gz")
+    _, data = rhessi.read_observing_summary(filename)
+    start = data["time_start"] + index * data["time_step"]
+    time_range = sunpy.time.TimeRange(start, start + 10 * data["time_step"])
+
+    _, subset = rhessi.read_observing_summary(filename, time_range=time_range)
+    assert subset["data"].shape[0] == min(10, data["data"].shape[0] - index)
+    np.testing.assert_array_equal(subset["data"], data["data"][index : index + 10])
+    assert is_time_equal(subset["time_start"], start)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_concatenate_observing_summaries(workers, tmp_path):
+    pytest.importorskip("h5py")
+    import h5py
+
+    filenames = [
+        "hsi_obssumm_20110404_042.fits.gz",
+        "hsi_obssumm_20120601_018_truncated.fits.gz",
+    ]
+    output = rhessi.concatenate_observing_summaries(
+        [get_test_filepath(filename) for filename in filenames],
+        tmp_path / "obssumm.h5",
+        bands=["3 - 6 keV", 4],
+        workers=workers,
+        chunk_rows=1000,
+    )
+
+    expected_time = []
+    expected_countrate = []
+    for filename in filenames:
+        _, data = rhessi.parse_observing_summary_hdulist(
+            sunpy.io.read_file(get_test_filepath(filename))
+        )
+        expected_time.append(data["time"].utime)
+        expected_countrate.append(data["data"][:, [0, 4]])
+
+    with h5py.File(output, "r") as h5file:
+        assert list(h5file.attrs["labels"]) == ["3 - 6 keV", "50 - 100 keV"]
+        np.testing.assert_array_equal(
+            h5file["countrate"][:], np.concatenate(expected_countrate)
+        )
+        np.testing.assert_allclose(
+            h5file["time"][:], np.concatenate(expected_time), rtol=0, atol=1e-3
+        )
+
+
+def test_concatenate_observing_summaries_index(tmp_path):
+    pytest.importorskip("h5py")
+    import h5py
+
+    dbase = rhessi.parse_observing_summary_dbase_file(
+        get_test_filepath("hsi_obssumm_filedb_201104.txt")
+    )
+    index = rhessi.observing_summary_file_index(dbase)
+    files = rhessi.get_observing_summary_filenames(
+        index, sunpy.time.TimeRange("2011-04-04 06:00", "2011-04-04 07:00")
+    )
+    # the index lists the files as .fit, the test file is a gzipped copy
+    shutil.copy(
+        get_test_filepath("hsi_obssumm_20110404_042.fits.gz"),
+        tmp_path / "hsi_obssumm_20110404_042.fit.gz",
+    )
+    output = rhessi.concatenate_observing_summaries(
+        {"filename": files}, tmp_path / "obssumm.h5", directory=tmp_path
+    )
+    with h5py.File(output, "r") as h5file:
+        assert h5file["countrate"].shape == (21600, 9)
+
+
 def test_uncompress_countrate():
     """
     Test that function fails if given uncompressed counts out of range.
@@ -116,6 +666,45 @@ def test_uncompress_countrate():
     assert counts[1] == 4080
 
 
+def test_uncompress_countrate_lookup_table():
+    """
+    Test the lookup table against the loop of hsi_obs_summ_decompress.pro.
+    """
+    expected = np.zeros(256, dtype=int)
+    total = 0
+    for i in range(16):
+        expected[16 * i : 16 * (i + 1)] = np.arange(16) * 2**i + total
+        total = expected[16 * (i + 1) - 1] + 2**i
+
+    compressed = np.arange(256, dtype=np.uint8)
+    counts = rhessi.uncompress_countrate(compressed)
+    assert counts.dtype == np.int32
+    np.testing.assert_array_equal(counts, expected)
+    for dtype in [np.int16, np.uint32, np.uint64]:
+        np.testing.assert_array_equal(
+            rhessi.uncompress_countrate(compressed.astype(dtype)), expected
+        )
+    for dtype in [np.uint32, np.uint64]:
+        with pytest.raises(ValueError):
+            rhessi.uncompress_countrate(np.array([256], dtype=dtype))
+
+
+@pytest.mark.parametrize("dtype", [np.int32, np.int64, np.float64])
+def test_uncompress_countrate_out(dtype):
+    compressed = np.array([[0, 128], [255, 3]], dtype=np.uint8)
+    out = np.empty(compressed.shape, dtype=dtype)
+    counts = rhessi.uncompress_countrate(compressed, out=out)
+    assert counts is out
+    np.testing.assert_array_equal(out, rhessi.uncompress_countrate(compressed))
+
+
+def test_uncompress_countrate_out_too_small():
+    with pytest.raises(ValueError, match="int16"):
+        rhessi.uncompress_countrate(
+            np.array([255], dtype=np.uint8), out=np.empty(1, dtype=np.int16)
+        )
+
+
 # Test `rhessi.parse_obssumm_dbase_file(...)`
 
 
@@ -151,22 +740,61 @@ def test_parse_observing_summary_dbase_file_mock():
     assert len(dbase_data.keys()) == 7
 
     # verify each of the 7 fields
-    assert dbase_data["filename"] == [
-        "hsi_obssumm_19721101_139.fit",
-        "hsi_obssumm_19721102_144.fit",
-    ]
-    assert dbase_data["orb_st"] == [7, 9]
-    assert dbase_data["orb_end"] == [8, 10]
-    assert dbase_data["start_time"] == [
-        parse_time((1972, 11, 1, 0, 0)),
-        parse_time((1972, 11, 2, 0, 0)),
-    ]
-    assert dbase_data["end_time"] == [
-        parse_time((1972, 11, 2, 0, 0)),
-        parse_time((1972, 11, 3, 0, 0)),
-    ]
-    assert dbase_data["status_flag"] == [3, 4]
-    assert dbase_data["npackets"] == [2, 1]
+    np.testing.assert_array_equal(
+        dbase_data["filename"],
+        ["hsi_obssumm_19721101_139.fit", "hsi_obssumm_19721102_144.fit"],
+    )
+    np.testing.assert_array_equal(dbase_data["orb_st"], [7, 9])
+    np.testing.assert_array_equal(dbase_data["orb_end"], [8, 10])
+    assert all(dbase_data["start_time"] == parse_time(["1972-11-01", "1972-11-02"]))
+    assert all(dbase_data["end_time"] == parse_time(["1972-11-02", "1972-11-03"]))
+    np.testing.assert_array_equal(dbase_data["status_flag"], [3, 4])
+    np.testing.assert_array_equal(dbase_data["npackets"], [2, 1])
+    assert dbase_data["orb_st"].dtype.kind == "i"
+
+
+@pytest.mark.parametrize(
+    ("time_range", "expected"),
+    [
+        (("2011-04-03 12:00", "2011-04-04 12:00"), ["20110403", "20110404"]),
+        (("2011-04-03 00:00", "2011-04-04 00:00"), ["20110403"]),
+        (("2011-04-30 12:00", "2011-05-03 00:00"), ["20110430"]),
+        (("2011-03-01", "2011-04-01"), []),
+        (
+            ("1972-11-01 12:00", "2011-04-02 12:00"),
+            ["19721101", "19721102", "20110401", "20110402"],
+        ),
+    ],
+)
+def test_get_observing_summary_filenames(time_range, expected):
+    if LooseVersion(platform.python_version()) <= LooseVersion("3.7.0"):
+        mock_file = mock.mock_open()
+        mock_file.return_value.__iter__.return_value = hessi_data().splitlines()
+    else:
+        mock_file = mock.mock_open(read_data=hessi_data())
+    with mock.patch("sunkit_instruments.rhessi.rhessi.open", mock_file, create=True):
+        mock_dbase = rhessi.parse_observing_summary_dbase_file(None)
+    dbase = rhessi.parse_observing_summary_dbase_file(
+        get_test_filepath("hsi_obssumm_filedb_201104.txt")
+    )
+    # the monthly dbase files do not need to be in order
+    index = rhessi.observing_summary_file_index([dbase, mock_dbase])
+    assert np.all(np.diff(index["start_mjd"]) >= 0)
+
+    filenames = rhessi.get_observing_summary_filenames(
+        index, sunpy.time.TimeRange(time_range)
+    )
+    assert [filename[12:20] for filename in filenames] == expected
+
+
+def test_get_observing_summary_filenames_dbase():
+    dbase = rhessi.parse_observing_summary_dbase_file(
+        get_test_filepath("hsi_obssumm_filedb_201104.txt")
+    )
+    filenames = rhessi.get_observing_summary_filenames(
+        dbase, sunpy.time.TimeRange("2011-04-10 06:00", "2011-04-10 07:00")
+    )
+    np.testing.assert_array_equal(filenames, ["hsi_obssumm_20110410_028.fit"])
 
 
 # Test `rhessi._build_energy_bands(...)`
@@ -243,6 +871,39 @@ def test_imagecube2map():
     assert maps["6-12 keV"][1].fits_header["DATAMAX"] == pytest.approx(0.1157, abs=1e-4)
 
 
+def test_imagecube2map_lazy():
+    fname = get_test_filepath("hsi_imagecube_clean_20151214_2255_2tx2e.fits")
+    maps = rhessi.imagecube2map(fname)
+    lazy_maps = rhessi.imagecube2map(fname, lazy=True)
+
+    assert list(lazy_maps.keys()) == list(maps.keys())
+    for key, sequence in maps.items():
+        assert len(lazy_maps[key]) == len(sequence)
+        for amap, lazy_map in zip(sequence, lazy_maps[key]):
+            assert isinstance(lazy_map, sunpy.map.GenericMap)
+            np.testing.assert_array_equal(lazy_map.data, amap.data)
+            assert dict(lazy_map.meta) == dict(amap.meta)
+        assert lazy_maps[key][-1].date == sequence[-1].date
+        assert [amap.date for amap in lazy_maps[key][::-1]] == [
+            amap.date for amap in list(sequence)[::-1]
+        ]
+        with pytest.raises(IndexError):
+            lazy_maps[key][len(sequence)]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_imagecube2map_memmap(lazy):
+    fname = get_test_filepath("hsi_imagecube_clean_20151214_2255_2tx2e.fits")
+    maps = rhessi.imagecube2map(fname, lazy=lazy)
+    for sequence in maps.values():
+        for amap in sequence:
+            # the image is a view into the memory-mapped file, not a copy
+            base = amap.data
+            while getattr(base, "base", None) is not None:
+                base = base.base
+            assert isinstance(base, mmap.mmap)
+
+
 def test_imagecube2map_edgecase():
     fname = get_test_filepath("hsi_imagecube_clean_20150930_1307_1tx1e.fits")
     maps = rhessi.imagecube2map(fname)